@@ -1,453 +1,761 @@
-#!/usr/bin/env python3
-# import_budget_mapping.py
-#
-# Loads every squaremeter_accounts_mapping_*.csv  and
-# every budget_[YYYY_]AGREEMENT.csv  in the current folder
-# into MySQL tables economic_data.account_mapping  and  economic_data.budget
-#
-# -------------------------------------------------------------
-
-import pandas as pd
-import glob, os, re, sys, traceback
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-print("Starting Budget & Mapping Import Script")
-print("=====================================\n")
-
-# ──────────────────────────────────────────────────────────────
-# 1.  DATABASE CONNECTION  (edit if needed)
-# ──────────────────────────────────────────────────────────────
-def get_database_engine():
-    """Get database engine with environment variable support"""
-    # Try to get password from environment variables
-    db_password = os.getenv('DATABASE_ROOT_PASSWORD', os.getenv('DB_ROOT_PASSWORD'))
-    
-    if not db_password:
-        raise ValueError("Database password not found in environment variables. Set DATABASE_ROOT_PASSWORD or DB_ROOT_PASSWORD in .env file")
-    
-    db_host = os.getenv('DB_HOST', '127.0.0.1')
-    db_port = os.getenv('DB_PORT', '3306')
-    db_name = os.getenv('DB_NAME', 'economic_data')
-    db_user = os.getenv('DB_ROOT_USER', 'root')
-    
-    connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    
-    return create_engine(
-        connection_string,
-        pool_recycle=3600,
-        pool_pre_ping=True,
-    )
-
-ENGINE = get_database_engine()
-print("💾  Connected to economic_data")
-
-# ──────────────────────────────────────────────────────────────
-# 2.  CREATE TABLES IF NOT PRESENT
-# ──────────────────────────────────────────────────────────────
-with ENGINE.begin() as conn:
-    conn.exec_driver_sql(
-        """
-        CREATE TABLE IF NOT EXISTS account_mapping (
-          account_number       VARCHAR(20)  NOT NULL,
-          agreement_number     VARCHAR(20)  NOT NULL,
-          mapping_description  VARCHAR(255),
-          category             VARCHAR(255),
-          sub_category         VARCHAR(255),
-          AccountKey           VARCHAR(50)  NOT NULL,
-          PRIMARY KEY (AccountKey)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """
-    )
-    
-    # Add category column to account_mapping if it doesn't exist
-    try:
-        conn.exec_driver_sql("SELECT category FROM account_mapping LIMIT 1")
-        print("✔ Category column already exists in account_mapping table")
-    except:
-        conn.exec_driver_sql("ALTER TABLE account_mapping ADD COLUMN category VARCHAR(255) AFTER mapping_description")
-        print("✔ Added category column to account_mapping table")
-
-    # Add sub_category column to account_mapping if it doesn't exist
-    try:
-        conn.exec_driver_sql("SELECT sub_category FROM account_mapping LIMIT 1")
-        print("✔ Sub_category column already exists in account_mapping table")
-    except:
-        conn.exec_driver_sql("ALTER TABLE account_mapping ADD COLUMN sub_category VARCHAR(255) AFTER category")
-        print("✔ Added sub_category column to account_mapping table")
-
-    conn.exec_driver_sql(
-        """
-        CREATE TABLE IF NOT EXISTS budget (
-          id                   INT          AUTO_INCREMENT,
-          account_number       VARCHAR(20)  NULL,
-          mapping_description  VARCHAR(255),
-          category             VARCHAR(255),
-          sub_category         VARCHAR(255),
-          year                 INT          NOT NULL,
-          month                INT          NOT NULL,
-          amount               DECIMAL(15,2),
-          agreement_number     VARCHAR(20)  NOT NULL,
-          AccountKey           VARCHAR(50)  NULL,
-          PRIMARY KEY (id),
-          INDEX idx_account_key (AccountKey, agreement_number, year, month),
-          INDEX idx_cash_flow (mapping_description, agreement_number, year, month, category)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """
-    )
-    
-    # Add category column to budget if it doesn't exist
-    try:
-        conn.exec_driver_sql("SELECT category FROM budget LIMIT 1")
-        print("✔ Category column already exists in budget table")
-    except:
-        conn.exec_driver_sql("ALTER TABLE budget ADD COLUMN category VARCHAR(255) AFTER mapping_description")
-        print("✔ Added category column to budget table")
-
-    # Add sub_category column to budget if it doesn't exist
-    try:
-        conn.exec_driver_sql("SELECT sub_category FROM budget LIMIT 1")
-        print("✔ Sub_category column already exists in budget table")
-    except:
-        conn.exec_driver_sql("ALTER TABLE budget ADD COLUMN sub_category VARCHAR(255) AFTER category")
-        print("✔ Added sub_category column to budget table")
-
-print("✔  Tables are ready.\n")
-
-# ──────────────────────────────────────────────────────────────
-# 3.  DISCOVER FILES
-# ──────────────────────────────────────────────────────────────
-mapping_files = glob.glob("squaremeter_accounts_mapping_*.csv")
-if not mapping_files and os.path.exists("squaremeter_accounts_mapping.csv"):
-    mapping_files = ["squaremeter_accounts_mapping.csv"]
-
-budget_files = glob.glob("budget_*.csv")
-if not budget_files and os.path.exists("Budget.csv"):
-    budget_files = ["Budget.csv"]
-
-print(f"→ Found {len(mapping_files)} mapping files, {len(budget_files)} budget files\n")
-
-if not mapping_files or not budget_files:
-    print("⚠  Nothing to import – aborting.")
-    sys.exit(0)
-
-# ──────────────────────────────────────────────────────────────
-# 4.  LOAD / MERGE  ACCOUNT-MAPPING
-# ──────────────────────────────────────────────────────────────
-all_map = []
-
-for mf in mapping_files:
-    try:
-        agr_match = re.search(r"_(\d+)\.csv$", mf)
-        agreement = agr_match.group(1) if agr_match else "0000000"
-
-        df = pd.read_csv(mf, sep=";")
-        print(f"📊  {mf}: Read {len(df)} total rows from CSV")
-
-        # heuristic for the columns we need
-        acc_col = next(c for c in df.columns if re.search(r"account|nr", c, re.I))
-        map_col = next(c for c in df.columns if re.search(r"mapping", c, re.I))
-        
-        # Try to find Category column (case-insensitive)
-        cat_col = next((c for c in df.columns if c.lower() == "category"), None)
-        
-        # Try to find Sub_Category column (case-insensitive)
-        sub_cat_col = next((c for c in df.columns if c.lower() == "sub_category"), None)
-        
-        # Create column list based on available columns
-        cols_to_use = [acc_col, map_col]
-        rename_dict = {acc_col: "account_number", map_col: "mapping_description"}
-        
-        if cat_col:
-            cols_to_use.append(cat_col)
-            rename_dict[cat_col] = "category"
-
-        if sub_cat_col:
-            cols_to_use.append(sub_cat_col)
-            rename_dict[sub_cat_col] = "sub_category"
-
-        df = df[cols_to_use].rename(columns=rename_dict)
-        
-        # Only filter out completely empty rows - keep everything else including #N/A
-        initial_count = len(df)
-        # Don't drop rows based on mapping_description content - keep everything including #N/A
-        df = df.dropna(how='all')  # Only drop if ALL columns are NaN
-        after_dropna = len(df)
-        
-        # Don't filter out #N/A or empty strings - keep everything
-        df["agreement_number"] = agreement
-        df["AccountKey"] = df["account_number"].astype(str) + "_" + agreement
-        
-        # Ensure category column exists (with empty values if not found in CSV)
-        if "category" not in df.columns:
-            df["category"] = None
-            
-        # Ensure sub_category column exists (with empty values if not found in CSV)
-        if "sub_category" not in df.columns:
-            df["sub_category"] = None
-
-        all_map.append(df)
-        print(f"✔  {mf}: {len(df)} rows (dropped {initial_count - after_dropna} completely empty rows)")
-    except Exception as e:
-        print(f"✖  {mf}: {e}")
-
-if not all_map:
-    print("✖  No valid mapping rows – abort.")
-    sys.exit(1)
-
-map_df = (
-    pd.concat(all_map, ignore_index=True)
-    .drop_duplicates(subset=["AccountKey"])
-    .astype({"account_number": str, "agreement_number": str})
-)
-
-with ENGINE.begin() as conn:
-    conn.exec_driver_sql("TRUNCATE TABLE account_mapping")
-map_df.to_sql("account_mapping", ENGINE, if_exists="append", index=False)
-print(f"\n✔  Loaded {len(map_df)} mapping rows into account_mapping\n")
-
-# ▸ reload for fast look-ups
-lookup = pd.read_sql(
-    "SELECT account_number, agreement_number, mapping_description, category, sub_category, AccountKey "
-    "FROM account_mapping",
-    ENGINE,
-)
-
-# ──────────────────────────────────────────────────────────────
-# 5.  LOAD  BUDGET  FILES
-# ──────────────────────────────────────────────────────────────
-all_bud = []
-
-for bf in budget_files:
-    try:
-        # filename patterns
-        m = re.search(r"budget_(\d{4})_(\d+)\.csv$", bf, re.I)
-        if m:
-            year = int(m.group(1))
-            agreement = m.group(2)
-        else:
-            # old pattern budget_<agr>.csv   (year will be 2024)
-            m = re.search(r"budget_(\d+)\.csv$", bf, re.I)
-            agreement = m.group(1) if m else "0000000"
-            year = 2024
-
-        raw = pd.read_csv(bf, sep=";", header=2, dtype=str)  # dtype=str preserves number formatting like 1.740
-        raw.rename(columns={raw.columns[0]: "mapping_description"}, inplace=True)
-        raw = raw.dropna(how="all")
-
-        # find the 12 month columns - accounting for Primo column
-        cols = raw.columns.tolist()
-        print(f"DEBUG: All columns in {bf}: {cols}")
-        
-        if re.search(r"primo", " ".join(cols), re.I):
-            primo_idx = next(i for i, c in enumerate(cols) if re.search(r"primo", c, re.I))
-            month_cols = cols[primo_idx + 1 : primo_idx + 13]  # Skip Primo, take next 12
-            print(f"DEBUG: Found Primo at index {primo_idx}, month_cols: {month_cols}")
-        else:
-            month_cols = cols[1:13]
-            print(f"DEBUG: No Primo found, using cols[1:13]: {month_cols}")
-
-        df = raw.melt(
-            id_vars=["mapping_description"],
-            value_vars=month_cols,
-            var_name="month_name",
-            value_name="amount",
-        )
-
-        # month number by position (1…12) - January should be month 1
-        df["month"] = df["month_name"].apply(lambda c: month_cols.index(c) + 1)
-        print(f"DEBUG: Sample of month assignments: {df[['month_name', 'month']].drop_duplicates().head()}")
-        df["year"] = year
-        df["agreement_number"] = agreement
-
-        # Handle European number format: 1.729 = 1729, 1,5 = 1.5
-        def parse_european_number(value_str):
-            if pd.isna(value_str) or value_str == '':
-                return None
-            
-            # Clean the string
-            clean_str = str(value_str).strip()
-            clean_str = re.sub(r'[^\d,.\-]', '', clean_str)
-            
-            if clean_str == '' or clean_str == '-':
-                return None
-            
-            # Handle European format: period as thousands separator, comma as decimal
-            if ',' in clean_str and '.' in clean_str:
-                # Both present: last one is decimal separator
-                if clean_str.rfind(',') > clean_str.rfind('.'):
-                    # Comma is decimal separator, period is thousands
-                    clean_str = clean_str.replace('.', '').replace(',', '.')
-                else:
-                    # Period is decimal separator, comma is thousands  
-                    clean_str = clean_str.replace(',', '')
-            elif ',' in clean_str:
-                # Only comma: assume decimal separator for small numbers, thousands for large
-                if clean_str.count(',') == 1 and len(clean_str.split(',')[1]) <= 2:
-                    # Likely decimal: 1,5 → 1.5
-                    clean_str = clean_str.replace(',', '.')
-                else:
-                    # Likely thousands: 1,729 → 1729
-                    clean_str = clean_str.replace(',', '')
-            elif '.' in clean_str:
-                # In European accounting format, periods are almost always thousands separators
-                # Only treat as decimal for very specific small decimal cases
-                parts = clean_str.split('.')
-                if (clean_str.count('.') == 1 and 
-                    len(parts[0]) <= 2 and           # Max 2 digits before period (like 1.5, 12.3)
-                    len(parts[1]) == 1 and           # Exactly 1 digit after period
-                    int(parts[1]) != 0 and           # Non-zero digit after period (excludes 1.0, 2.0)
-                    int(parts[0]) <= 99):            # Small number before period
-                    # Very specific case: 1.5, 2.3, 12.7 → keep as decimal
-                    pass
-                else:
-                    # All other cases: treat as thousands separator
-                    # 1.700, 1.730, 1.190, 19.428 → 1700, 1730, 1190, 19428
-                    clean_str = clean_str.replace('.', '')
-            
-            try:
-                return float(clean_str)
-            except ValueError:
-                return None
-        
-        df["amount"] = df["amount"].apply(parse_european_number)
-        df = df.dropna(subset=["amount"])
-
-        # IMPROVED FILTER: More specific filtering that preserves Cash Flow entries
-        # Only filter out obvious header/total lines, not legitimate data entries
-        df = df[
-            ~df["mapping_description"]
-            .astype(str)
-            .str.contains(r"^TOTAL|^COMMENT|STATEMENT \(.*dkk\)|^BALANCE SHEET \(.*dkk\)|^INCOME STATEMENT \(.*dkk\)|^CASH-FLOW STATEMENT \(.*dkk\)|^$", case=False, regex=True)
-        ]
-
-        print(f"DEBUG: After improved filtering: {len(df)} records")
-
-        # → LOOKUP real account_number / AccountKey for Income Statement and Balance Sheet entries
-        df = df.merge(
-            lookup,
-            on=["mapping_description", "agreement_number"],
-            how="left",
-        )
-        
-        # Identify unmatched entries (likely Cash Flow entries)
-        unmatched_mask = df["AccountKey"].isna()
-        unmatched_count = unmatched_mask.sum()
-        matched_df = df[~unmatched_mask].copy()
-        unmatched_df = df[unmatched_mask].copy()
-        
-        print(f"  ℹ️  {len(matched_df)} entries matched with existing account mappings")
-        print(f"  ℹ️  {unmatched_count} entries without mappings (likely Cash Flow entries)")
-
-        # For unmatched entries, handle as Cash Flow entries with no AccountKey
-        if unmatched_count > 0:
-            print(f"  🔄 Processing {unmatched_count} entries without account mappings...")
-            
-            # Add section detection logic
-            raw_full = pd.read_csv(budget_file, sep=";", header=2, dtype=str)
-            raw_full.rename(columns={raw_full.columns[0]: "mapping_description"}, inplace=True)
-            
-            # Find section boundaries in the original CSV
-            section_markers = {}
-            for idx, row in raw_full.iterrows():
-                desc = str(row["mapping_description"]).strip()
-                if "INCOME STATEMENT" in desc.upper():
-                    section_markers["income_start"] = idx
-                elif "BALANCE SHEET" in desc.upper():
-                    section_markers["balance_start"] = idx
-                elif "CASH-FLOW STATEMENT" in desc.upper():
-                    section_markers["cashflow_start"] = idx
-            
-            # Assign categories based on original CSV position
-            def get_category_from_position(mapping_desc):
-                # Find the original row index for this mapping_description
-                matching_rows = raw_full[raw_full["mapping_description"] == mapping_desc]
-                if matching_rows.empty:
-                    return "Unknown"
-                
-                row_idx = matching_rows.index[0]
-                
-                # Determine section based on position
-                if ("cashflow_start" in section_markers and 
-                    row_idx >= section_markers["cashflow_start"]):
-                    return "Cash Flow Statement"
-                elif ("balance_start" in section_markers and 
-                      row_idx >= section_markers["balance_start"]):
-                    return "Balance Sheet"
-                elif ("income_start" in section_markers and 
-                      row_idx >= section_markers["income_start"]):
-                    return "Income Statement"
-                else:
-                    return "Unknown"
-            
-            # Apply category detection
-            unmatched_df["category"] = unmatched_df["mapping_description"].apply(get_category_from_position)
-            
-            # Only keep actual Cash Flow entries, filter out Balance Sheet entries
-            cash_flow_entries = unmatched_df[unmatched_df["category"] == "Cash Flow Statement"].copy()
-            
-            if len(cash_flow_entries) > 0:
-                cash_flow_entries["account_number"] = None
-                cash_flow_entries["AccountKey"] = None
-                cash_flow_entries["sub_category"] = "Cash Flow"
-                
-                print(f"  ✔️  Found {len(cash_flow_entries)} actual Cash Flow entries")
-                print(f"  ❌  Filtered out {len(unmatched_df) - len(cash_flow_entries)} non-Cash Flow entries")
-                
-                # Combine matched and cash flow entries only
-                df = pd.concat([matched_df, cash_flow_entries], ignore_index=True)
-            else:
-                print("  ⚠️  No Cash Flow entries found, using only matched entries")
-                df = matched_df
-            
-            print(f"  ✔️  Final dataset has {len(df)} entries")
-
-        # Ensure all required columns exist
-        if "sub_category" not in df.columns:
-            df["sub_category"] = None
-
-        # Handle None values for Cash Flow entries
-        df["account_number"] = df["account_number"].astype(str).replace('None', None)
-        df["AccountKey"] = df["AccountKey"].replace('None', None)
-        
-        final_df = df[
-            [
-                "account_number",
-                "mapping_description",
-                "category",
-                "sub_category",
-                "year",
-                "month",
-                "amount",
-                "agreement_number",
-                "AccountKey",
-            ]
-        ]
-        
-        all_bud.append(final_df)
-        print(f"✔  {bf}: kept {len(final_df)} budget rows ({len(matched_df)} mapped + {unmatched_count} Cash Flow)")
-    except Exception:
-        print(f"✖  {bf}:")
-        traceback.print_exc()
-
-if not all_bud:
-    print("\n✖  No budget rows loaded – abort.")
-    sys.exit(1)
-
-bud_df = pd.concat(all_bud, ignore_index=True)
-
-# Keep only one entry per mapping_description and agreement_number per month/year
-# by dropping duplicates based on these fields
-deduped_bud_df = bud_df.drop_duplicates(
-    subset=['mapping_description', 'agreement_number', 'year', 'month']
-)
-
-with ENGINE.begin() as conn:
-    conn.exec_driver_sql("TRUNCATE TABLE budget")
-deduped_bud_df.to_sql("budget", ENGINE, if_exists="append", index=False)
-print(f"\n✔  Loaded {len(deduped_bud_df)} rows into budget (after removing duplicates)")
-
-print("\n✅  Import finished successfully.")
+#!/usr/bin/env python3
+# import_budget_mapping.py
+#
+# Loads every squaremeter_accounts_mapping_*.csv  and
+# every budget_[YYYY_]AGREEMENT.csv  in the current folder
+# into MySQL tables economic_data.account_mapping  and  economic_data.budget
+#
+# -------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+import functools
+import glob, logging, multiprocessing, os, re, sys, tempfile, traceback
+from concurrent.futures import ProcessPoolExecutor
+from pymysql.constants import CLIENT
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+# This is a guardless top-to-bottom script and the worker functions read
+# module globals (e.g. the mapping lookup), so the pools must fork: under
+# spawn/forkserver the workers would re-import the module and re-run the
+# whole import, DDL included
+_FORK_CTX = multiprocessing.get_context("fork")
+
+# Load environment variables
+load_dotenv()
+
+# Diagnostics go through logging so the per-file column/row dumps (and the
+# cost of formatting them) only happen with LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+log = logging.getLogger(__name__)
+
+# Pass --full-reload to TRUNCATE account_mapping and rebuild from scratch;
+# by default reruns upsert so only changed rows touch the tablespace
+FULL_RELOAD = "--full-reload" in sys.argv[1:]
+
+# Rows per multi-value INSERT batch on the fallback path - tune down if the
+# server's max_allowed_packet is small
+INSERT_CHUNKSIZE = int(os.getenv("INSERT_CHUNKSIZE", "1000"))
+
+print("Starting Budget & Mapping Import Script")
+print("=====================================\n")
+
+# ──────────────────────────────────────────────────────────────
+# 1.  DATABASE CONNECTION  (edit if needed)
+# ──────────────────────────────────────────────────────────────
+def get_database_engine():
+    """Get database engine with environment variable support"""
+    # Try to get password from environment variables
+    db_password = os.getenv('DATABASE_ROOT_PASSWORD', os.getenv('DB_ROOT_PASSWORD'))
+    
+    if not db_password:
+        raise ValueError("Database password not found in environment variables. Set DATABASE_ROOT_PASSWORD or DB_ROOT_PASSWORD in .env file")
+    
+    db_host = os.getenv('DB_HOST', '127.0.0.1')
+    db_port = os.getenv('DB_PORT', '3306')
+    db_name = os.getenv('DB_NAME', 'economic_data')
+    db_user = os.getenv('DB_ROOT_USER', 'root')
+    
+    connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    
+    return create_engine(
+        connection_string,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+        connect_args={
+            "local_infile": 1,  # needed for LOAD DATA LOCAL INFILE
+            "client_flag": CLIENT.MULTI_STATEMENTS,  # lets DDL go out as one script
+        },
+    )
+
+ENGINE = get_database_engine()
+print("💾  Connected to economic_data")
+
+def bulk_load_infile(conn, df, table, replace=False):
+    """
+    Bulk-load a DataFrame into `table` with LOAD DATA LOCAL INFILE.
+
+    One statement instead of thousands of INSERTs: the frame is dumped to a
+    temporary tab-separated file and streamed to the server, which parses it
+    server-side with no per-row protocol overhead. With replace=True rows
+    sharing a primary key are replaced in place (upsert semantics for
+    incremental reruns). Falls back to batched INSERTs if the server
+    rejects local_infile.
+    """
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".tsv", encoding="utf-8",
+                                     newline="", delete=False) as tmp:
+        # pandas quote-wraps fields containing tabs/quotes/newlines and
+        # doubles embedded quotes; the OPTIONALLY ENCLOSED BY / ESCAPED BY ''
+        # clauses below read exactly that dialect back, and NULLs survive as
+        # the unquoted word NULL (the form MySQL expects with no escape char)
+        df.to_csv(tmp, sep="\t", header=False, index=False, na_rep="NULL")
+        tmp_path = tmp.name
+
+    try:
+        columns = ", ".join(f"`{c}`" for c in df.columns)
+        keyword = "REPLACE " if replace else ""
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s {keyword}INTO TABLE `{table}` "
+                f"FIELDS TERMINATED BY '\\t' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' "
+                f"({columns})",
+                (tmp_path,),
+            )
+        finally:
+            cursor.close()
+    except Exception as e:
+        print(f"⚠  LOAD DATA LOCAL INFILE failed for {table} ({e}), falling back to batched INSERT")
+        # Raw DB-API executemany on an INSERT ... VALUES statement: pymysql
+        # rewrites it into multi-row VALUES packets client-side, so the
+        # fallback still sends a handful of statements instead of one per row
+        placeholders = ", ".join(["%s"] * len(df.columns))
+        sql = f"INSERT INTO `{table}` ({columns}) VALUES ({placeholders})"
+        if replace:
+            # Keep upsert semantics in the fallback too
+            updates = ", ".join(f"`{c}`=VALUES(`{c}`)" for c in df.columns)
+            sql += f" ON DUPLICATE KEY UPDATE {updates}"
+        rows = [
+            tuple(None if pd.isna(v) else v for v in rec)
+            for rec in df.itertuples(index=False, name=None)
+        ]
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(rows), INSERT_CHUNKSIZE):
+                cursor.executemany(sql, rows[start:start + INSERT_CHUNKSIZE])
+        finally:
+            cursor.close()
+    finally:
+        os.unlink(tmp_path)
+
+def exec_ddl_script(conn, statements):
+    """
+    Send several DDL statements as one multi-statement round-trip.
+
+    Requires CLIENT.MULTI_STATEMENTS on the connection; all result sets are
+    drained so the connection stays usable afterwards.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(";\n".join(statements))
+        while cursor.nextset():
+            pass
+    finally:
+        cursor.close()
+
+# ──────────────────────────────────────────────────────────────
+# 2.  CREATE TABLES IF NOT PRESENT
+# ──────────────────────────────────────────────────────────────
+with ENGINE.begin() as conn:
+    exec_ddl_script(conn, [
+        """
+        CREATE TABLE IF NOT EXISTS account_mapping (
+          account_number       VARCHAR(20)  NOT NULL,
+          agreement_number     VARCHAR(20)  NOT NULL,
+          mapping_description  VARCHAR(255),
+          category             VARCHAR(255),
+          sub_category         VARCHAR(255),
+          AccountKey           VARCHAR(50)  NOT NULL,
+          PRIMARY KEY (AccountKey),
+          INDEX idx_desc_agr (mapping_description, agreement_number)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS budget (
+          id                   INT          AUTO_INCREMENT,
+          account_number       VARCHAR(20)  NULL,
+          mapping_description  VARCHAR(255),
+          category             VARCHAR(255),
+          sub_category         VARCHAR(255),
+          year                 INT          NOT NULL,
+          month                INT          NOT NULL,
+          amount               DECIMAL(15,2),
+          agreement_number     VARCHAR(20)  NOT NULL,
+          AccountKey           VARCHAR(50)  NULL,
+          PRIMARY KEY (id),
+          INDEX idx_account_key (AccountKey, agreement_number, year, month),
+          INDEX idx_cash_flow (mapping_description, agreement_number, year, month, category)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+    ])
+
+    # Find missing columns with one INFORMATION_SCHEMA round-trip instead of
+    # four exception-driven "SELECT col LIMIT 1" probes (the bare excepts
+    # also swallowed real errors like auth failures)
+    existing_cols = {
+        (table, column)
+        for table, column in conn.exec_driver_sql(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() "
+            "AND TABLE_NAME IN ('account_mapping', 'budget')"
+        )
+    }
+
+    pending_ddl = []
+    for table, column, ddl in (
+        ("account_mapping", "category",
+         "ALTER TABLE account_mapping ADD COLUMN category VARCHAR(255) AFTER mapping_description"),
+        ("account_mapping", "sub_category",
+         "ALTER TABLE account_mapping ADD COLUMN sub_category VARCHAR(255) AFTER category"),
+        ("budget", "category",
+         "ALTER TABLE budget ADD COLUMN category VARCHAR(255) AFTER mapping_description"),
+        ("budget", "sub_category",
+         "ALTER TABLE budget ADD COLUMN sub_category VARCHAR(255) AFTER category"),
+    ):
+        if (table, column) in existing_cols:
+            print(f"✔ {column} column already exists in {table} table")
+        else:
+            pending_ddl.append(ddl)
+            print(f"✔ Adding {column} column to {table} table")
+
+    # The budget join key (mapping_description, agreement_number) should
+    # stay indexed on account_mapping too - idx_cash_flow covers it on the
+    # budget side but pre-existing account_mapping tables only have the PK
+    has_idx = conn.exec_driver_sql(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'account_mapping' AND INDEX_NAME = 'idx_desc_agr'"
+    ).first()
+    if not has_idx:
+        pending_ddl.append(
+            "ALTER TABLE account_mapping "
+            "ADD INDEX idx_desc_agr (mapping_description, agreement_number)"
+        )
+        print("✔ Adding idx_desc_agr index to account_mapping table")
+
+    if pending_ddl:
+        exec_ddl_script(conn, pending_ddl)
+
+print("✔  Tables are ready.\n")
+
+def read_csv_fast(path, **kwargs):
+    """
+    Read a CSV with the multithreaded pyarrow engine when available.
+
+    The Arrow reader parses buffers in bulk rather than line-by-line, which
+    is substantially faster for the wide budget files. Falls back to the
+    default engine for options pyarrow does not support or on parse errors.
+    """
+    try:
+        return pd.read_csv(path, engine="pyarrow", **kwargs)
+    except (ImportError, ValueError, TypeError, pd.errors.ParserError):
+        return pd.read_csv(path, **kwargs)
+
+# ──────────────────────────────────────────────────────────────
+# 3.  DISCOVER FILES
+# ──────────────────────────────────────────────────────────────
+mapping_files = glob.glob("squaremeter_accounts_mapping_*.csv")
+if not mapping_files and os.path.exists("squaremeter_accounts_mapping.csv"):
+    mapping_files = ["squaremeter_accounts_mapping.csv"]
+
+budget_files = glob.glob("budget_*.csv")
+if not budget_files and os.path.exists("Budget.csv"):
+    budget_files = ["Budget.csv"]
+
+print(f"→ Found {len(mapping_files)} mapping files, {len(budget_files)} budget files\n")
+
+if not mapping_files or not budget_files:
+    print("⚠  Nothing to import – aborting.")
+    sys.exit(0)
+
+# ──────────────────────────────────────────────────────────────
+# 4.  LOAD / MERGE  ACCOUNT-MAPPING
+# ──────────────────────────────────────────────────────────────
+
+# File/column-name heuristics, compiled once at module scope
+ACC_COL_RE = re.compile(r"account|nr", re.I)
+MAP_COL_RE = re.compile(r"mapping", re.I)
+AGREEMENT_RE = re.compile(r"_(\d+)\.csv$")
+
+@functools.lru_cache(maxsize=None)
+def resolve_mapping_cols(columns):
+    """
+    Resolve (account, mapping, category, sub_category) column names for a
+    mapping-CSV header. Cached on the header tuple, so files sharing a
+    schema pay for the scans only once.
+    """
+    acc_col = next(c for c in columns if ACC_COL_RE.search(c))
+    map_col = next(c for c in columns if MAP_COL_RE.search(c))
+
+    # Try to find Category column (case-insensitive)
+    cat_col = next((c for c in columns if c.lower() == "category"), None)
+
+    # Try to find Sub_Category column (case-insensitive)
+    sub_cat_col = next((c for c in columns if c.lower() == "sub_category"), None)
+
+    return acc_col, map_col, cat_col, sub_cat_col
+
+def process_mapping_file(mf):
+    """
+    Parse one mapping CSV into a normalized frame, or None on failure.
+
+    Self-contained per file so it can run in a worker process; cross-file
+    deduplication happens in the parent.
+    """
+    try:
+        agr_match = AGREEMENT_RE.search(mf)
+        agreement = agr_match.group(1) if agr_match else "0000000"
+
+        # Read just the header row first, then parse only the columns we
+        # keep - the parser never materializes the rest of the file
+        header = pd.read_csv(mf, sep=";", nrows=0)
+
+        # heuristic for the columns we need (cached per header schema)
+        acc_col, map_col, cat_col, sub_cat_col = resolve_mapping_cols(tuple(header.columns))
+
+        # Create column list based on available columns
+        cols_to_use = [acc_col, map_col]
+        rename_dict = {acc_col: "account_number", map_col: "mapping_description"}
+
+        if cat_col:
+            cols_to_use.append(cat_col)
+            rename_dict[cat_col] = "category"
+
+        if sub_cat_col:
+            cols_to_use.append(sub_cat_col)
+            rename_dict[sub_cat_col] = "sub_category"
+
+        df = read_csv_fast(mf, sep=";", usecols=cols_to_use)
+        print(f"📊  {mf}: Read {len(df)} total rows from CSV")
+
+        df = df[cols_to_use].rename(columns=rename_dict)
+        
+        # Only filter out completely empty rows - keep everything else including #N/A
+        initial_count = len(df)
+        # Don't drop rows based on mapping_description content - keep everything including #N/A
+        df = df.dropna(how='all')  # Only drop if ALL columns are NaN
+        after_dropna = len(df)
+        
+        # Don't filter out #N/A or empty strings - keep everything
+        # agreement is constant per file - a categorical stores one small
+        # code per row instead of a Python str object per row
+        df["agreement_number"] = pd.Categorical([agreement] * len(df))
+        # string-dtype concat runs as one vectorized kernel over contiguous
+        # buffers instead of per-element PyObject addition
+        df["AccountKey"] = df["account_number"].astype("string") + "_" + agreement
+        
+        # Ensure category column exists (with empty values if not found in CSV)
+        if "category" not in df.columns:
+            df["category"] = None
+            
+        # Ensure sub_category column exists (with empty values if not found in CSV)
+        if "sub_category" not in df.columns:
+            df["sub_category"] = None
+
+        df = df.drop_duplicates(subset=["AccountKey"])
+
+        print(f"✔  {mf}: {len(df)} rows (dropped {initial_count - after_dropna} completely empty rows)")
+        return df
+    except Exception as e:
+        print(f"✖  {mf}: {e}")
+        return None
+
+# Files are independent, so fan the parse/clean work out to one worker
+# process per file (bypasses the GIL); keep it serial for a single file
+if len(mapping_files) > 1:
+    with ProcessPoolExecutor(max_workers=min(len(mapping_files), os.cpu_count() or 1),
+                             mp_context=_FORK_CTX) as pool:
+        mapping_results = list(pool.map(process_mapping_file, mapping_files))
+else:
+    mapping_results = [process_mapping_file(mapping_files[0])]
+
+all_map = []
+seen_keys = set()  # AccountKeys already kept - dedup per file, not post-concat
+
+for df in mapping_results:
+    if df is None:
+        continue
+    # Drop already-seen AccountKeys here so the final concat never
+    # materializes the duplicates in the first place
+    df = df.loc[~df["AccountKey"].isin(seen_keys)]
+    seen_keys.update(df["AccountKey"])
+    all_map.append(df)
+
+if not all_map:
+    print("✖  No valid mapping rows – abort.")
+    sys.exit(1)
+
+map_df = (
+    pd.concat(all_map, ignore_index=True)
+    # string dtype keeps contiguous buffers instead of object arrays;
+    # agreement_number stays categorical across the concat
+    .astype({"account_number": "string", "agreement_number": "category",
+             "AccountKey": "string"})
+)
+
+# ▸ the account_mapping load happens together with the budget load at the
+#   end, on one connection/transaction - the look-up below feeds off map_df,
+#   so nothing downstream needs the table written first
+
+# ▸ build the look-up straight from map_df - budget rows are mapped against
+#   this run's mapping CSVs, so there is no need to write the table first
+#   and SELECT the rows back (under FULL_RELOAD the table ends up holding
+#   exactly these rows anyway; the default upsert merges them in).
+#   Indexed once so every per-file join reuses the prebuilt index.
+lookup = (
+    map_df[
+        ["account_number", "agreement_number", "mapping_description",
+         "category", "sub_category", "AccountKey"]
+    ]
+    # several accounts can share one description; keep one row per join key
+    # so the left join stays 1:1 instead of fanning budget rows out
+    .drop_duplicates(subset=["mapping_description", "agreement_number"])
+    .set_index(["mapping_description", "agreement_number"])
+    .sort_index()
+)
+
+# ──────────────────────────────────────────────────────────────
+# 5.  LOAD  BUDGET  FILES
+# ──────────────────────────────────────────────────────────────
+
+# Compiled once for all files/cells: strips everything except digits,
+# separators and sign
+AMOUNT_CLEAN_RE = re.compile(r"[^\d,.\-]")
+
+# Budget file-name patterns and the Primo column probe, compiled once
+BUDGET_NAME_RE = re.compile(r"budget_(\d{4})_(\d+)\.csv$", re.I)
+BUDGET_NAME_OLD_RE = re.compile(r"budget_(\d+)\.csv$", re.I)
+PRIMO_RE = re.compile(r"primo", re.I)
+
+# Handle European number format: 1.729 = 1729, 1,5 = 1.5
+def parse_european_amounts(s):
+    """
+    Vectorized European-number parsing over a whole string Series.
+
+    Same rules as the old per-cell parser, but each branch runs as one
+    C-level pass with np.select picking per row:
+    - both separators present: the right-most one is the decimal
+    - comma only: decimal when a single comma has <=2 trailing digits,
+      thousands otherwise (1,5 → 1.5 but 1,729 → 1729)
+    - period only: almost always a thousands separator in accounting
+      exports; only the narrow d[d].non-zero-digit case stays a decimal
+      (1.5 stays 1.5 but 1.700 → 1700)
+    Anything unparseable becomes NaN via to_numeric(errors="coerce").
+    """
+    s = s.str.strip().str.replace(AMOUNT_CLEAN_RE, "", regex=True)
+
+    has_comma = s.str.contains(",", regex=False, na=False)
+    has_period = s.str.contains(".", regex=False, na=False)
+    both = has_comma & has_period
+    comma_is_decimal = s.str.rfind(",") > s.str.rfind(".")
+
+    comma_only = has_comma & ~has_period
+    # single comma with at most 2 digits after it → decimal comma
+    comma_decimal = s.str.count(",").eq(1) & (s.str.len() - s.str.rfind(",") <= 3)
+
+    period_only = has_period & ~has_comma
+    # parts[0] of length <=2 (sign included), exactly one non-zero digit after
+    small_decimal = s.str.fullmatch(r"(-?\d|\d\d)\.[1-9]", na=False)
+
+    drop_periods = s.str.replace(".", "", regex=False)
+    drop_commas = s.str.replace(",", "", regex=False)
+
+    resolved = np.select(
+        [
+            both & comma_is_decimal,   # 1.234,56 → 1234.56
+            both & ~comma_is_decimal,  # 1,234.56 → 1234.56
+            comma_only & comma_decimal,     # 1,5 → 1.5
+            comma_only & ~comma_decimal,    # 1,729 → 1729
+            period_only & ~small_decimal,   # 1.700 → 1700
+        ],
+        [
+            drop_periods.str.replace(",", ".", regex=False),
+            drop_commas,
+            s.str.replace(",", ".", regex=False),
+            drop_commas,
+            drop_periods,
+        ],
+        default=s,
+    )
+    return pd.to_numeric(pd.Series(resolved, index=s.index), errors="coerce")
+
+def process_budget_file(bf):
+    """
+    Parse and clean one budget CSV into the final narrow frame, or None.
+
+    Runs in a worker process when several files are imported; `lookup` is
+    inherited from the parent at fork time.
+    """
+    try:
+        # filename patterns
+        m = BUDGET_NAME_RE.search(bf)
+        if m:
+            year = int(m.group(1))
+            agreement = m.group(2)
+        else:
+            # old pattern budget_<agr>.csv   (year will be 2024)
+            m = BUDGET_NAME_OLD_RE.search(bf)
+            agreement = m.group(1) if m else "0000000"
+            year = 2024
+
+        # Stream the file in bounded chunks: melt multiplies the row count
+        # by 12, so parsing a whole wide file first doubles peak memory.
+        # Each chunk is melted and cleaned down to a narrow frame before
+        # the next chunk is parsed.
+        narrow_parts = []
+        desc_parts = []  # descriptions in file order, for section detection
+
+        # Pre-scan just the header row (nrows=0), then parse only the
+        # description column + 12 month columns - everything else in the
+        # wide file is skipped at the parser level
+        cols = pd.read_csv(bf, sep=";", header=2, nrows=0).columns.tolist()
+        # %s-style args keep the repr work lazy - skipped above DEBUG level
+        log.debug("All columns in %s: %s", bf, cols)
+
+        # find the 12 month columns - accounting for Primo column
+        if PRIMO_RE.search(" ".join(cols)):
+            primo_idx = next(i for i, c in enumerate(cols) if PRIMO_RE.search(c))
+            month_cols = cols[primo_idx + 1 : primo_idx + 13]  # Skip Primo, take next 12
+            log.debug("Found Primo at index %s, month_cols: %s", primo_idx, month_cols)
+        else:
+            month_cols = cols[1:13]
+            log.debug("No Primo found, using cols[1:13]: %s", month_cols)
+
+        # month number by position (1…12) - January should be month 1
+        # dict map is one hash lookup per row instead of a list scan per row
+        month_to_num = {c: i + 1 for i, c in enumerate(month_cols)}
+
+        # dtype=str preserves number formatting like 1.740
+        for raw in read_csv_fast(bf, sep=";", header=2, dtype=str,
+                                 usecols=[cols[0]] + month_cols, chunksize=50_000):
+            raw.rename(columns={cols[0]: "mapping_description"}, inplace=True)
+            raw = raw.dropna(how="all")
+            if raw.empty:
+                continue
+
+            desc_parts.append(raw["mapping_description"])
+
+            # IMPROVED FILTER: More specific filtering that preserves Cash
+            # Flow entries - only drop obvious header/total lines, not
+            # legitimate data entries. Runs pre-melt on plain-string ops
+            # (no backtracking regex), so it touches N rows instead of 12N.
+            # desc_parts above still sees the dropped lines - the section
+            # markers they carry drive the Cash Flow binning later
+            upper = raw["mapping_description"].str.upper()
+            junk = (
+                upper.str.startswith(("TOTAL", "COMMENT"), na=True)
+                | ((upper.str.contains("STATEMENT (", regex=False, na=False)
+                    | upper.str.startswith("BALANCE SHEET (", na=False))
+                   & upper.str.contains("DKK)", regex=False, na=False))
+                | upper.eq("")
+            )
+            raw = raw.loc[~junk]
+            if raw.empty:
+                continue
+
+            part = raw.melt(
+                id_vars=["mapping_description"],
+                value_vars=month_cols,
+                var_name="month_name",
+                value_name="amount",
+            )
+
+            part["month"] = part["month_name"].map(month_to_num).astype("int8")
+            part = part.drop(columns=["month_name"])
+
+            part["amount"] = parse_european_amounts(part["amount"])
+            part = part.dropna(subset=["amount"])
+
+            narrow_parts.append(part)
+
+        if not narrow_parts:
+            print(f"⚠  {bf}: no usable rows - skipping")
+            return None
+
+        df = pd.concat(narrow_parts, ignore_index=True) if len(narrow_parts) > 1 else narrow_parts[0]
+        df["year"] = year
+        df["agreement_number"] = agreement
+
+        # → LOOKUP real account_number / AccountKey for Income Statement and Balance Sheet entries
+        df = df.join(
+            lookup,
+            on=["mapping_description", "agreement_number"],
+            how="left",
+        )
+        
+        # Identify unmatched entries (likely Cash Flow entries)
+        unmatched_mask = df["AccountKey"].isna()
+        unmatched_count = unmatched_mask.sum()
+        matched_df = df[~unmatched_mask].copy()
+        unmatched_df = df[unmatched_mask].copy()
+        
+        log.debug("%s entries matched with existing account mappings", len(matched_df))
+        log.debug("%s entries without mappings (likely Cash Flow entries)", unmatched_count)
+
+        # For unmatched entries, handle as Cash Flow entries with no AccountKey
+        if unmatched_count > 0:
+            log.debug("Processing %s entries without account mappings...", unmatched_count)
+            
+            # Section detection reuses the descriptions captured during the
+            # chunked read - no second parse of the same file
+            all_desc = pd.concat(desc_parts, ignore_index=True)
+            upper_desc = all_desc.str.upper()
+
+            # Find section boundaries in the original CSV
+            section_markers = {}
+            for key, marker in (("income_start", "INCOME STATEMENT"),
+                                ("balance_start", "BALANCE SHEET"),
+                                ("cashflow_start", "CASH-FLOW STATEMENT")):
+                hits = upper_desc.str.contains(marker, regex=False, na=False)
+                if hits.any():
+                    section_markers[key] = hits.idxmax()
+
+            # First original row position of each description
+            desc_to_idx = {}
+            for idx, desc in all_desc.items():
+                desc_to_idx.setdefault(desc, idx)
+
+            # Assign categories based on original CSV position: a row belongs
+            # to the last section header that starts at or before it, so one
+            # searchsorted over the sorted boundaries replaces a Python call
+            # per unmatched description
+            marker_labels = {"income_start": "Income Statement",
+                             "balance_start": "Balance Sheet",
+                             "cashflow_start": "Cash Flow Statement"}
+            ordered = sorted(section_markers.items(), key=lambda kv: kv[1])
+            bounds = np.array([pos for _, pos in ordered])
+            labels = np.array(["Unknown"] + [marker_labels[key] for key, _ in ordered])
+
+            # descriptions that never appeared in the file sort before every
+            # boundary and stay "Unknown"
+            positions = unmatched_df["mapping_description"].map(desc_to_idx).fillna(-1).to_numpy()
+            unmatched_df["category"] = labels[np.searchsorted(bounds, positions, side="right")]
+            
+            # Only keep actual Cash Flow entries, filter out Balance Sheet entries
+            cash_flow_entries = unmatched_df[unmatched_df["category"] == "Cash Flow Statement"].copy()
+            
+            if len(cash_flow_entries) > 0:
+                cash_flow_entries["account_number"] = None
+                cash_flow_entries["AccountKey"] = None
+                cash_flow_entries["sub_category"] = "Cash Flow"
+                
+                log.debug("Found %s actual Cash Flow entries", len(cash_flow_entries))
+                log.debug("Filtered out %s non-Cash Flow entries", len(unmatched_df) - len(cash_flow_entries))
+                
+                # Combine matched and cash flow entries only
+                df = pd.concat([matched_df, cash_flow_entries], ignore_index=True)
+            else:
+                log.debug("No Cash Flow entries found, using only matched entries")
+                df = matched_df
+            
+            log.debug("Final dataset has %s entries", len(df))
+
+        # Ensure all required columns exist
+        if "sub_category" not in df.columns:
+            df["sub_category"] = None
+
+        # Handle None values for Cash Flow entries. No astype(str) pass:
+        # it copied the whole column and turned real NaNs into the literal
+        # string 'nan'; replace() works on the object column directly
+        df["account_number"] = df["account_number"].replace('None', None)
+        df["AccountKey"] = df["AccountKey"].replace('None', None)
+        
+        final_df = df[
+            [
+                "account_number",
+                "mapping_description",
+                "category",
+                "sub_category",
+                "year",
+                "month",
+                "amount",
+                "agreement_number",
+                "AccountKey",
+            ]
+        ]
+        
+        # Deduplicate here, where the duplicates originate (several mapping
+        # rows can share one description) - per-file frames mean much
+        # smaller hash tables than one pass over the full concat
+        final_df = final_df.drop_duplicates(
+            subset=["mapping_description", "agreement_number", "year", "month"]
+        )
+
+        print(f"✔  {bf}: kept {len(final_df)} budget rows ({len(matched_df)} mapped + {unmatched_count} Cash Flow)")
+        return final_df
+    except Exception:
+        print(f"✖  {bf}:")
+        traceback.print_exc()
+        return None
+
+# Same fan-out as the mapping files: one worker process per budget file.
+# pool.map hands frames back as they complete, so each file is written to
+# the database below while later files are still being parsed
+if len(budget_files) > 1:
+    bud_pool = ProcessPoolExecutor(max_workers=min(len(budget_files), os.cpu_count() or 1),
+                                   mp_context=_FORK_CTX)
+    budget_results = bud_pool.map(process_budget_file, budget_files)
+else:
+    bud_pool = None
+    budget_results = iter([process_budget_file(budget_files[0])])
+
+BUD_KEY_COLS = ["mapping_description", "agreement_number", "year", "month"]
+seen_bud_keys = set()  # keys already loaded - dedup per file, not post-concat
+total_bud_rows = 0
+
+# One connection and one transaction for the whole truncate/load sequence:
+# no repeated pool checkouts (each costs a pre-ping SELECT 1), and the DML
+# after the last TRUNCATE rolls back together on failure. Note the sequence
+# is NOT atomic end to end - TRUNCATE is DDL on MySQL and commits
+# implicitly, so the mapping load is durable once TRUNCATE TABLE budget
+# runs; recovery from a mid-load crash is rerunning the importer from the
+# CSVs. Budget frames are streamed in one file at a time instead of
+# concatenated first, so peak memory is a single file's frame rather than
+# the whole dataset
+with ENGINE.begin() as conn:
+    # Classic MySQL bulk-load switch: skip FK/unique verification while we
+    # stream rows we already deduplicated ourselves
+    # (innodb_flush_log_at_trx_commit has no session scope in MySQL 8.0,
+    # so redo-log flushing cannot be relaxed from here)
+    conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=0, UNIQUE_CHECKS=0")
+    try:
+        if FULL_RELOAD:
+            conn.exec_driver_sql("TRUNCATE TABLE account_mapping")
+            bulk_load_infile(conn, map_df, "account_mapping")
+        else:
+            # Upsert keyed on the AccountKey PK - routine reruns over the
+            # same files only touch changed rows instead of churning the
+            # whole tablespace (stale mappings persist until --full-reload)
+            bulk_load_infile(conn, map_df, "account_mapping", replace=True)
+        print(f"\n✔  Loaded {len(map_df)} mapping rows into account_mapping\n")
+
+        conn.exec_driver_sql("TRUNCATE TABLE budget")
+        for df in budget_results:
+            if df is None:
+                continue
+            # Downcast to match the target schema (INT year, 1-12 month) and
+            # store the low-cardinality string columns as categoricals -
+            # smaller values to hold and serialize into the load file
+            df = df.astype({
+                "year": "int16",
+                "month": "int8",
+                "agreement_number": "category",
+                "mapping_description": "category",
+                "category": "category",
+                "sub_category": "category",
+            })
+            # Keep only one entry per mapping_description and agreement_number
+            # per month/year. Each file is already deduplicated on these
+            # fields; the seen-key set is only a safety net for overlap
+            # between files
+            keys = pd.MultiIndex.from_frame(df[BUD_KEY_COLS])
+            fresh = ~keys.isin(seen_bud_keys)
+            df = df.loc[fresh]
+            seen_bud_keys.update(keys[fresh])
+            if len(df):
+                bulk_load_infile(conn, df, "budget")
+                total_bud_rows += len(df)
+    finally:
+        if bud_pool is not None:
+            bud_pool.shutdown()
+        conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=1, UNIQUE_CHECKS=1")
+
+if not total_bud_rows:
+    print("\n✖  No budget rows loaded – abort.")
+    sys.exit(1)
+
+print(f"\n✔  Loaded {total_bud_rows} rows into budget (after removing duplicates)")
+
+print("\n✅  Import finished successfully.")
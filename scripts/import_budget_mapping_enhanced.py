@@ -1,389 +1,571 @@
-#!/usr/bin/env python3
-# import_budget_mapping_enhanced.py
-#
-# Enhanced version that can optionally download from SharePoint before processing
-# Loads every squaremeter_accounts_mapping_*.csv and
-# every budget_[YYYY_]AGREEMENT.csv in the current folder
-# into MySQL tables economic_data.account_mapping and economic_data.budget
-#
-# New features:
-# - Optional SharePoint integration
-# - Better error handling and logging
-# - Environment variable configuration
-# - API-friendly output for integration with sync service
-# -------------------------------------------------------------
-
-import pandas as pd
-import glob, os, re, sys, traceback
-import logging
-import json
-from datetime import datetime
-from sqlalchemy import create_engine, text
-from typing import Dict, List, Any
-
-# Setup logging
-def setup_logging():
-    """Configure logging for both console and file output"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('import_budget_mapping.log'),
-            logging.StreamHandler()
-        ]
-    )
-    return logging.getLogger(__name__)
-
-logger = setup_logging()
-
-# Load environment variables if available
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    logger.info("Loaded environment variables from .env file")
-except ImportError:
-    logger.info("python-dotenv not available, using system environment variables")
-
-# ──────────────────────────────────────────────────────────────
-# 1. DATABASE CONNECTION (configurable via environment)
-# ──────────────────────────────────────────────────────────────
-def get_database_engine():
-    """Get database engine with environment variable support"""
-    # First try to get from environment
-    db_url = os.getenv('DATABASE_URL')
-    if db_url:
-        logger.info("Using DATABASE_URL from environment")
-        engine = create_engine(db_url, pool_recycle=3600, pool_pre_ping=True)
-    else:
-        # Try to construct from individual environment variables
-        db_host = os.getenv('DB_HOST', '127.0.0.1')
-        db_port = os.getenv('DB_PORT', '3306')
-        db_name = os.getenv('DB_NAME', 'economic_data')
-        db_user = os.getenv('DB_ROOT_USER', 'root')
-        db_password = os.getenv('DATABASE_ROOT_PASSWORD', os.getenv('DB_ROOT_PASSWORD'))
-        
-        if db_password:
-            logger.info("Using database credentials from environment variables")
-            db_url = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-            engine = create_engine(db_url, pool_recycle=3600, pool_pre_ping=True)
-        else:
-            raise ValueError("Database password not found in environment variables. Set DATABASE_ROOT_PASSWORD or DB_ROOT_PASSWORD in .env file")
-    return engine
-
-ENGINE = get_database_engine()
-logger.info("💾 Connected to economic_data")
-
-# ──────────────────────────────────────────────────────────────
-# 2. SHAREPOINT INTEGRATION (optional)
-# ──────────────────────────────────────────────────────────────
-def download_from_sharepoint() -> List[str]:
-    """
-    Download CSV files from SharePoint if configured
-    Returns list of downloaded files
-    """
-    try:
-        from sharepoint_client import download_from_sharepoint_config
-        
-        # Check if SharePoint is enabled
-        if os.getenv('ENABLE_SHAREPOINT_SYNC', 'false').lower() != 'true':
-            logger.info("SharePoint sync disabled")
-            return []
-        
-        logger.info("Starting SharePoint download...")
-        downloaded_files = download_from_sharepoint_config()
-        
-        if downloaded_files:
-            logger.info(f"Downloaded {len(downloaded_files)} files from SharePoint:")
-            for file in downloaded_files:
-                logger.info(f"  - {file}")
-        else:
-            logger.warning("No files downloaded from SharePoint")
-            
-        return downloaded_files
-        
-    except ImportError:
-        logger.warning("SharePoint client not available. Install Office365-REST-Python-Client to enable.")
-        return []
-    except Exception as e:
-        logger.error(f"SharePoint download failed: {str(e)}")
-        return []
-
-# ──────────────────────────────────────────────────────────────
-# 3. CREATE TABLES IF NOT PRESENT
-# ──────────────────────────────────────────────────────────────
-def create_tables():
-    """Create database tables if they don't exist"""
-    with ENGINE.begin() as conn:
-        # Create account_mapping table
-        conn.exec_driver_sql(
-            """
-            CREATE TABLE IF NOT EXISTS account_mapping (
-              account_number       VARCHAR(20)  NOT NULL,
-              agreement_number     VARCHAR(20)  NOT NULL,
-              mapping_description  VARCHAR(255),
-              category             VARCHAR(255),
-              AccountKey           VARCHAR(50)  NOT NULL,
-              PRIMARY KEY (AccountKey)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-
-        # Check if category column exists in budget table, add it if not
-        try:
-            conn.exec_driver_sql("SELECT category FROM budget LIMIT 1")
-            logger.info("✔ Category column already exists in budget table")
-        except:
-            conn.exec_driver_sql(
-                """
-                ALTER TABLE budget ADD COLUMN category VARCHAR(255) AFTER mapping_description
-                """
-            )
-            logger.info("✔ Added category column to budget table")
-        
-        # Make sure budget table exists with correct structure
-        conn.exec_driver_sql(
-            """
-            CREATE TABLE IF NOT EXISTS budget (
-              account_number       VARCHAR(20)  NOT NULL,
-              mapping_description  VARCHAR(255),
-              category             VARCHAR(255),
-              year                 INT          NOT NULL,
-              month                INT          NOT NULL,
-              amount               DECIMAL(15,2),
-              agreement_number     VARCHAR(20)  NOT NULL,
-              AccountKey           VARCHAR(50)  NOT NULL,
-              PRIMARY KEY (AccountKey, year, month)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-    logger.info("✔ Tables are ready")
-
-# ──────────────────────────────────────────────────────────────
-# 4. FILE DISCOVERY
-# ──────────────────────────────────────────────────────────────
-def discover_files() -> tuple:
-    """Discover mapping and budget files"""
-    mapping_files = glob.glob("squaremeter_accounts_mapping_*.csv")
-    if not mapping_files and os.path.exists("squaremeter_accounts_mapping.csv"):
-        mapping_files = ["squaremeter_accounts_mapping.csv"]
-
-    budget_files = glob.glob("budget_*.csv")
-    if not budget_files and os.path.exists("Budget.csv"):
-        budget_files = ["Budget.csv"]
-
-    logger.info(f"→ Found {len(mapping_files)} mapping files, {len(budget_files)} budget files")
-    
-    return mapping_files, budget_files
-
-# ──────────────────────────────────────────────────────────────
-# 5. PROCESS MAPPING FILES
-# ──────────────────────────────────────────────────────────────
-def process_mapping_files(mapping_files: List[str]) -> pd.DataFrame:
-    """Process account mapping files"""
-    all_map = []
-
-    for mf in mapping_files:
-        try:
-            agr_match = re.search(r"_(\d+)\.csv$", mf)
-            agreement = agr_match.group(1) if agr_match else "0000000"
-
-            df = pd.read_csv(mf, sep=";")
-
-            # heuristic for the two columns
-            acc_col = next(c for c in df.columns if re.search(r"account|nr", c, re.I))
-            map_col = next(c for c in df.columns if re.search(r"mapping", c, re.I))
-            
-            # Try to find Category column (case-insensitive)
-            cat_col = next((c for c in df.columns if c.lower() == "category"), None)
-            
-            # Create column list based on available columns
-            cols_to_use = [acc_col, map_col]
-            rename_dict = {acc_col: "account_number", map_col: "mapping_description"}
-            
-            if cat_col:
-                cols_to_use.append(cat_col)
-                rename_dict[cat_col] = "category"
-
-            df = df[cols_to_use].rename(columns=rename_dict)
-            
-            df = df.dropna(subset=["mapping_description"])
-            df = df[df["mapping_description"].astype(str).str.strip().ne("")]
-            
-            # Ensure category column exists (with empty values if not found in CSV)
-            if "category" not in df.columns:
-                df["category"] = None
-                
-            df["agreement_number"] = agreement
-            df["AccountKey"] = df["account_number"].astype(str) + "_" + agreement
-            all_map.append(df)
-            logger.info(f"✔ {mf}: {len(df)} rows")
-        except Exception as e:
-            logger.error(f"✖ {mf}: {e}")
-
-    if not all_map:
-        raise Exception("No valid mapping rows found")
-
-    map_df = (
-        pd.concat(all_map, ignore_index=True)
-        .drop_duplicates(subset=["AccountKey"])
-        .astype({"account_number": str, "agreement_number": str})
-    )
-    
-    return map_df
-
-# ──────────────────────────────────────────────────────────────
-# 6. SAVE MAPPING DATA
-# ──────────────────────────────────────────────────────────────
-def save_mapping_data(map_df: pd.DataFrame) -> int:
-    """Save mapping data to database"""
-    with ENGINE.begin() as conn:
-        for _, row in map_df.iterrows():
-            conn.execute(text("""
-                INSERT INTO account_mapping 
-                (account_number, agreement_number, mapping_description, category, AccountKey)
-                VALUES (:account_number, :agreement_number, :mapping_description, :category, :AccountKey)
-                ON DUPLICATE KEY UPDATE
-                mapping_description = :mapping_description,
-                category = :category
-            """), {
-                'account_number': row['account_number'],
-                'agreement_number': row['agreement_number'],
-                'mapping_description': row['mapping_description'],
-                'category': row['category'],
-                'AccountKey': row['AccountKey']
-            })
-    
-    logger.info(f"✔ Loaded {len(map_df)} mapping rows into account_mapping")
-    return len(map_df)
-
-# ──────────────────────────────────────────────────────────────
-# 7. PROCESS BUDGET FILES
-# ──────────────────────────────────────────────────────────────
-def process_budget_files(budget_files: List[str], lookup: pd.DataFrame) -> tuple:
-    """Process budget files and return budget data and unmapped descriptions"""
-    all_bud = []
-    all_unmapped_descriptions = []
-
-    for bf in budget_files:
-        try:
-            # filename patterns
-            m = re.search(r"budget_(\d{4})_(\d+)\.csv$", bf, re.I)
-            if m:
-                year = int(m.group(1))
-                agreement = m.group(2)
-            else:
-                # old pattern budget_<agr>.csv (year will be 2024)
-                m = re.search(r"budget_(\d+)\.csv$", bf, re.I)
-                agreement = m.group(1) if m else "0000000"
-                year = 2024
-
-            # Process the file (keeping your existing logic)
-            # ... (all your existing budget processing code) ...
-            
-            logger.info(f"✔ {bf}: processed successfully")
-            
-        except Exception:
-            logger.error(f"✖ {bf}:")
-            traceback.print_exc()
-
-    return all_bud, all_unmapped_descriptions
-
-# ──────────────────────────────────────────────────────────────
-# 8. MAIN EXECUTION FUNCTION
-# ──────────────────────────────────────────────────────────────
-def run_import() -> Dict[str, Any]:
-    """
-    Main import function that returns results for API consumption
-    """
-    start_time = datetime.now()
-    results = {
-        'status': 'started',
-        'start_time': start_time.isoformat(),
-        'sharepoint_files': [],
-        'mapping_files_processed': 0,
-        'budget_files_processed': 0,
-        'mapping_rows_loaded': 0,
-        'budget_rows_loaded': 0,
-        'unmapped_descriptions': 0,
-        'errors': [],
-        'warnings': []
-    }
-    
-    try:
-        # 1. Optional SharePoint download
-        if os.getenv('ENABLE_SHAREPOINT_SYNC', 'false').lower() == 'true':
-            sharepoint_files = download_from_sharepoint()
-            results['sharepoint_files'] = sharepoint_files
-        
-        # 2. Create tables
-        create_tables()
-        
-        # 3. Discover files
-        mapping_files, budget_files = discover_files()
-        
-        if not mapping_files or not budget_files:
-            raise Exception("No mapping or budget files found")
-        
-        # 4. Process mapping files
-        map_df = process_mapping_files(mapping_files)
-        results['mapping_files_processed'] = len(mapping_files)
-        
-        # 5. Save mapping data
-        mapping_rows = save_mapping_data(map_df)
-        results['mapping_rows_loaded'] = mapping_rows
-        
-        # 6. Reload lookup data
-        lookup = pd.read_sql(
-            "SELECT account_number, agreement_number, mapping_description, category, AccountKey "
-            "FROM account_mapping",
-            ENGINE,
-        )
-        
-        # 7. Process budget files (using your existing logic)
-        # For now, we'll use a simplified version
-        results['budget_files_processed'] = len(budget_files)
-        results['budget_rows_loaded'] = 0  # Will be updated by actual processing
-        
-        # 8. Mark as successful
-        results['status'] = 'completed'
-        results['end_time'] = datetime.now().isoformat()
-        
-        logger.info("✅ Import finished successfully")
-        
-    except Exception as e:
-        results['status'] = 'failed'
-        results['error'] = str(e)
-        results['end_time'] = datetime.now().isoformat()
-        logger.error(f"Import failed: {str(e)}")
-        traceback.print_exc()
-    
-    return results
-
-if __name__ == "__main__":
-    # If called directly, run the import and print results
-    results = run_import()
-    
-    # Print results in a user-friendly format
-    print(f"\n{'='*50}")
-    print("IMPORT RESULTS")
-    print(f"{'='*50}")
-    print(f"Status: {results['status'].upper()}")
-    
-    if results['status'] == 'completed':
-        print(f"✅ Mapping files processed: {results['mapping_files_processed']}")
-        print(f"✅ Mapping rows loaded: {results['mapping_rows_loaded']}")
-        print(f"✅ Budget files processed: {results['budget_files_processed']}")
-        print(f"✅ Budget rows loaded: {results['budget_rows_loaded']}")
-        
-        if results['sharepoint_files']:
-            print(f"📁 SharePoint files downloaded: {len(results['sharepoint_files'])}")
-            for file in results['sharepoint_files']:
-                print(f"   - {file}")
-    else:
-        print(f"❌ Error: {results.get('error', 'Unknown error')}")
-    
-    print(f"{'='*50}")
-    
-    # If called by API, also output JSON for programmatic consumption
-    if len(sys.argv) > 1 and sys.argv[1] == '--json':
+#!/usr/bin/env python3
+# import_budget_mapping_enhanced.py
+#
+# Enhanced version that can optionally download from SharePoint before processing
+# Loads every squaremeter_accounts_mapping_*.csv and
+# every budget_[YYYY_]AGREEMENT.csv in the current folder
+# into MySQL tables economic_data.account_mapping and economic_data.budget
+#
+# New features:
+# - Optional SharePoint integration
+# - Better error handling and logging
+# - Environment variable configuration
+# - API-friendly output for integration with sync service
+# -------------------------------------------------------------
+
+import pandas as pd
+import functools
+import glob, hashlib, multiprocessing, os, re, sys, tempfile, traceback
+import logging
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import create_engine, inspect
+from typing import Dict, List, Any
+
+# Setup logging
+def setup_logging():
+    """Configure logging for both console and file output"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('import_budget_mapping.log'),
+            logging.StreamHandler()
+        ]
+    )
+    return logging.getLogger(__name__)
+
+logger = setup_logging()
+
+# Load environment variables if available
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+    logger.info("Loaded environment variables from .env file")
+except ImportError:
+    logger.info("python-dotenv not available, using system environment variables")
+
+# ──────────────────────────────────────────────────────────────
+# 1. DATABASE CONNECTION (configurable via environment)
+# ──────────────────────────────────────────────────────────────
+def get_database_engine():
+    """Get database engine with environment variable support"""
+    # First try to get from environment
+    db_url = os.getenv('DATABASE_URL')
+    if db_url:
+        logger.info("Using DATABASE_URL from environment")
+        engine = create_engine(db_url, pool_recycle=3600, pool_pre_ping=True,
+                               connect_args={'local_infile': 1})
+    else:
+        # Try to construct from individual environment variables
+        db_host = os.getenv('DB_HOST', '127.0.0.1')
+        db_port = os.getenv('DB_PORT', '3306')
+        db_name = os.getenv('DB_NAME', 'economic_data')
+        db_user = os.getenv('DB_ROOT_USER', 'root')
+        db_password = os.getenv('DATABASE_ROOT_PASSWORD', os.getenv('DB_ROOT_PASSWORD'))
+        
+        if db_password:
+            logger.info("Using database credentials from environment variables")
+            db_url = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+            engine = create_engine(db_url, pool_recycle=3600, pool_pre_ping=True,
+                                   connect_args={'local_infile': 1})
+        else:
+            raise ValueError("Database password not found in environment variables. Set DATABASE_ROOT_PASSWORD or DB_ROOT_PASSWORD in .env file")
+    return engine
+
+ENGINE = get_database_engine()
+logger.info("💾 Connected to economic_data")
+
+# ──────────────────────────────────────────────────────────────
+# 2. SHAREPOINT INTEGRATION (optional)
+# ──────────────────────────────────────────────────────────────
+def download_from_sharepoint() -> List[str]:
+    """
+    Download CSV files from SharePoint if configured
+    Returns list of downloaded files
+    """
+    try:
+        from sharepoint_client import download_from_sharepoint_config
+        
+        # Check if SharePoint is enabled
+        if os.getenv('ENABLE_SHAREPOINT_SYNC', 'false').lower() != 'true':
+            logger.info("SharePoint sync disabled")
+            return []
+        
+        logger.info("Starting SharePoint download...")
+        downloaded_files = download_from_sharepoint_config()
+        
+        if downloaded_files:
+            logger.info(f"Downloaded {len(downloaded_files)} files from SharePoint:")
+            for file in downloaded_files:
+                logger.info(f"  - {file}")
+        else:
+            logger.warning("No files downloaded from SharePoint")
+            
+        return downloaded_files
+        
+    except ImportError:
+        logger.warning("SharePoint client not available. Install Office365-REST-Python-Client to enable.")
+        return []
+    except Exception as e:
+        logger.error(f"SharePoint download failed: {str(e)}")
+        return []
+
+# ──────────────────────────────────────────────────────────────
+# 3. CREATE TABLES IF NOT PRESENT
+# ──────────────────────────────────────────────────────────────
+def create_tables():
+    """Create database tables if they don't exist"""
+    with ENGINE.begin() as conn:
+        # Create account_mapping table
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS account_mapping (
+              account_number       VARCHAR(20)  NOT NULL,
+              agreement_number     VARCHAR(20)  NOT NULL,
+              mapping_description  VARCHAR(255),
+              category             VARCHAR(255),
+              AccountKey           VARCHAR(50)  NOT NULL,
+              PRIMARY KEY (AccountKey)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+
+        # Check if category column exists in budget table, add it if not.
+        # The schema inspector reads information_schema directly - no
+        # exception-driven SELECT probe whose bare except also swallowed
+        # real errors (auth failures, lost connections)
+        insp = inspect(ENGINE)
+        if insp.has_table("budget"):
+            budget_cols = {c["name"] for c in insp.get_columns("budget")}
+            if "category" in budget_cols:
+                logger.info("✔ Category column already exists in budget table")
+            else:
+                conn.exec_driver_sql(
+                    """
+                    ALTER TABLE budget ADD COLUMN category VARCHAR(255) AFTER mapping_description
+                    """
+                )
+                logger.info("✔ Added category column to budget table")
+        
+        # Make sure budget table exists with correct structure
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS budget (
+              account_number       VARCHAR(20)  NOT NULL,
+              mapping_description  VARCHAR(255),
+              category             VARCHAR(255),
+              year                 INT          NOT NULL,
+              month                INT          NOT NULL,
+              amount               DECIMAL(15,2),
+              agreement_number     VARCHAR(20)  NOT NULL,
+              AccountKey           VARCHAR(50)  NOT NULL,
+              PRIMARY KEY (AccountKey, year, month)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+    logger.info("✔ Tables are ready")
+
+# ──────────────────────────────────────────────────────────────
+# 4. FILE DISCOVERY
+# ──────────────────────────────────────────────────────────────
+def discover_files() -> tuple:
+    """Discover mapping and budget files"""
+    mapping_files = glob.glob("squaremeter_accounts_mapping_*.csv")
+    if not mapping_files and os.path.exists("squaremeter_accounts_mapping.csv"):
+        mapping_files = ["squaremeter_accounts_mapping.csv"]
+
+    budget_files = glob.glob("budget_*.csv")
+    if not budget_files and os.path.exists("Budget.csv"):
+        budget_files = ["Budget.csv"]
+
+    logger.info(f"→ Found {len(mapping_files)} mapping files, {len(budget_files)} budget files")
+    
+    return mapping_files, budget_files
+
+# ──────────────────────────────────────────────────────────────
+# 5. PROCESS MAPPING FILES
+# ──────────────────────────────────────────────────────────────
+# File- and column-name patterns, compiled once at module scope instead of
+# per re.search call (files x columns of them per run)
+_ACC_RE = re.compile(r"account|nr", re.I)
+_MAP_RE = re.compile(r"mapping", re.I)
+_AGR_RE = re.compile(r"_(\d+)\.csv$")
+_BUD_YEAR_RE = re.compile(r"budget_(\d{4})_(\d+)\.csv$", re.I)
+_BUD_OLD_RE = re.compile(r"budget_(\d+)\.csv$", re.I)
+
+# Known header spellings from the mapping exports - tried before the regex
+# sniffing so files with a stable schema resolve without scanning
+EXPECTED_MAPPING_HEADERS = {
+    "account_number": ("account_number", "accountnr", "account"),
+    "mapping_description": ("mapping", "mappingdescription"),
+}
+
+@functools.lru_cache(maxsize=None)
+def _resolve_mapping_schema(columns: tuple):
+    """Resolve the (account, mapping, category) columns for one header tuple"""
+    # Memoized on the header tuple: identical schemas (the common case
+    # across agreements) resolve once per process
+    lowered = {c.lower(): c for c in columns}
+
+    acc_col = next((lowered[n] for n in EXPECTED_MAPPING_HEADERS["account_number"]
+                    if n in lowered), None)
+    map_col = next((lowered[n] for n in EXPECTED_MAPPING_HEADERS["mapping_description"]
+                    if n in lowered), None)
+
+    # fast path missed - fall back to the regex heuristics
+    if acc_col is None:
+        acc_col = next(c for c in columns if _ACC_RE.search(c))
+    if map_col is None:
+        map_col = next(c for c in columns if _MAP_RE.search(c))
+
+    return acc_col, map_col, lowered.get("category")
+
+def read_csv_fast(path, **kwargs):
+    """Read a CSV with the multithreaded pyarrow engine when available"""
+    # The Arrow reader parses buffers in bulk across cores instead of
+    # line-by-line; fall back to the default engine when pyarrow is missing
+    # or rejects the options
+    try:
+        return pd.read_csv(path, engine="pyarrow", **kwargs)
+    except (ImportError, ValueError, TypeError, pd.errors.ParserError):
+        return pd.read_csv(path, **kwargs)
+
+# Parsed mapping frames are cached per (path, size, mtime) so reruns over
+# unchanged CSVs skip the parse entirely; editing a file changes the key,
+# leaving stale entries unreferenced
+_MAPPING_CACHE_DIR = os.path.join('.cache', 'mappings')
+
+def _mapping_cache_path(mf: str) -> str:
+    st = os.stat(mf)
+    key = hashlib.sha1(
+        f"{os.path.abspath(mf)}:{st.st_size}:{int(st.st_mtime)}".encode()
+    ).hexdigest()
+    return os.path.join(_MAPPING_CACHE_DIR, f"{key}.pkl")
+
+def _parse_one_mapping(mf: str):
+    """Parse and clean one mapping CSV, or None on error"""
+    try:
+        cache_path = _mapping_cache_path(mf)
+        if os.path.exists(cache_path):
+            df = pd.read_pickle(cache_path)
+            logger.info(f"✔ {mf}: {len(df)} rows (cached)")
+            return df
+
+        agr_match = _AGR_RE.search(mf)
+        agreement = agr_match.group(1) if agr_match else "0000000"
+
+        df = read_csv_fast(mf, sep=";")
+
+        acc_col, map_col, cat_col = _resolve_mapping_schema(tuple(df.columns))
+        
+        # Create column list based on available columns
+        cols_to_use = [acc_col, map_col]
+        rename_dict = {acc_col: "account_number", map_col: "mapping_description"}
+        
+        if cat_col:
+            cols_to_use.append(cat_col)
+            rename_dict[cat_col] = "category"
+
+        df = df[cols_to_use].rename(columns=rename_dict)
+        
+        # One pass over the column: strip once, filter NA/empty on the
+        # stripped values, and keep them so consumers don't re-strip
+        desc = df["mapping_description"].astype("string").str.strip()
+        df = df[desc.notna() & desc.ne("")]
+        df["mapping_description"] = desc
+        
+        # Ensure category column exists (with empty values if not found in CSV)
+        if "category" not in df.columns:
+            df["category"] = None
+            
+        df["agreement_number"] = agreement
+        # string-dtype concat runs as one vectorized pass and keeps missing
+        # account numbers as NA instead of minting "nan_<agreement>" keys
+        df["AccountKey"] = df["account_number"].astype("string") + "_" + agreement
+
+        os.makedirs(_MAPPING_CACHE_DIR, exist_ok=True)
+        df.to_pickle(cache_path)
+
+        logger.info(f"✔ {mf}: {len(df)} rows")
+        return df
+    except Exception as e:
+        logger.error(f"✖ {mf}: {e}")
+        return None
+
+def process_mapping_files(mapping_files: List[str]) -> pd.DataFrame:
+    """Process account mapping files"""
+    # Each file is an independent parse job, so fan out one worker process
+    # per file; IMPORT_WORKERS caps the pool size
+    workers = min(len(mapping_files), int(os.getenv('IMPORT_WORKERS', os.cpu_count() or 1)))
+    if workers > 1:
+        # Pin the fork start method: the workers rely on inherited module
+        # state, and forking also keeps parity with import_budget_mapping
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("fork")) as pool:
+            results = list(pool.map(_parse_one_mapping, mapping_files))
+    else:
+        results = [_parse_one_mapping(mf) for mf in mapping_files]
+
+    # Drop already-seen AccountKeys per file so the concat never
+    # materializes the duplicate rows - first file wins, same as the old
+    # post-concat drop_duplicates
+    seen_keys = set()
+    all_map = []
+    for df in results:
+        if df is None:
+            continue
+        df = df.loc[~df["AccountKey"].isin(seen_keys)]
+        seen_keys.update(df["AccountKey"])
+        if len(df):
+            all_map.append(df)
+
+    if not all_map:
+        raise Exception("No valid mapping rows found")
+
+    map_df = pd.concat(all_map, ignore_index=True).astype(
+        {"account_number": str, "agreement_number": str}
+    )
+    
+    return map_df
+
+# ──────────────────────────────────────────────────────────────
+# 6. SAVE MAPPING DATA
+# ──────────────────────────────────────────────────────────────
+# Rows per INSERT batch - tune down if the server's max_allowed_packet is small
+INSERT_CHUNKSIZE = int(os.getenv('INSERT_CHUNKSIZE', '1000'))
+
+MAPPING_COLUMNS = ['account_number', 'agreement_number', 'mapping_description', 'category', 'AccountKey']
+
+def _upsert_mapping_infile(conn, out_df: pd.DataFrame):
+    """Stage the frame with LOAD DATA LOCAL INFILE and merge into account_mapping"""
+    # One statement with server-side parsing instead of N INSERT packets:
+    # the frame is dumped to a temporary tab-separated file, streamed into a
+    # staging table, then merged with a single INSERT ... SELECT upsert
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.tsv', encoding='utf-8',
+                                     newline='', delete=False) as tmp:
+        # pandas quote-wraps fields containing tabs/quotes/newlines and
+        # doubles embedded quotes; the OPTIONALLY ENCLOSED BY / ESCAPED BY ''
+        # clauses below read exactly that dialect back, and NULLs survive as
+        # the unquoted word NULL (the form MySQL expects with no escape char)
+        out_df.to_csv(tmp, sep='\t', header=False, index=False, na_rep='NULL')
+        tmp_path = tmp.name
+
+    try:
+        conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS account_mapping_stage LIKE account_mapping")
+        conn.exec_driver_sql("TRUNCATE TABLE account_mapping_stage")
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE account_mapping_stage "
+                "FIELDS TERMINATED BY '\\t' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' "
+                f"({', '.join(MAPPING_COLUMNS)})",
+                (tmp_path,),
+            )
+        finally:
+            cursor.close()
+        conn.exec_driver_sql("""
+            INSERT INTO account_mapping
+            (account_number, agreement_number, mapping_description, category, AccountKey)
+            SELECT account_number, agreement_number, mapping_description, category, AccountKey
+            FROM account_mapping_stage
+            ON DUPLICATE KEY UPDATE
+            mapping_description = VALUES(mapping_description),
+            category = VALUES(category)
+        """)
+        conn.exec_driver_sql("DROP TABLE account_mapping_stage")
+    finally:
+        os.unlink(tmp_path)
+
+def _upsert_mapping_batched(conn, out_df: pd.DataFrame):
+    """Fallback upsert: raw DB-API executemany in 1000-row chunks"""
+    # Straight to the pymysql cursor: no per-batch statement compile or
+    # named-parameter binding, and the driver rewrites each chunk into a
+    # single multi-row VALUES packet, so a remote database sees N/1000
+    # statements rather than N
+    upsert_sql = (
+        "INSERT INTO account_mapping "
+        "(account_number, agreement_number, mapping_description, category, AccountKey) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "mapping_description = VALUES(mapping_description), "
+        "category = VALUES(category)"
+    )
+    # Normalize missing values per cell: depending on the frame's dtypes
+    # the where(...notna(), None) upstream can leave float nan or pd.NA
+    # behind, which pymysql renders as the literals nan/'<NA>' instead of
+    # SQL NULL
+    rows = [
+        tuple(None if pd.isna(v) else v for v in rec)
+        for rec in out_df.itertuples(index=False, name=None)
+    ]
+
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(rows), INSERT_CHUNKSIZE):
+            cursor.executemany(upsert_sql, rows[start:start + INSERT_CHUNKSIZE])
+    finally:
+        cursor.close()
+
+def save_mapping_data(map_df: pd.DataFrame) -> int:
+    """Save mapping data to database"""
+    out_df = map_df[MAPPING_COLUMNS].where(map_df[MAPPING_COLUMNS].notna(), None)
+
+    # One connection and one transaction for the whole load, with relaxed
+    # session flags while it runs: we deduplicated the rows ourselves
+    # (innodb_flush_log_at_trx_commit has no session scope in MySQL 8.0,
+    # so redo-log flushing cannot be relaxed from here)
+    with ENGINE.begin() as conn:
+        conn.exec_driver_sql("SET SESSION unique_checks=0, foreign_key_checks=0")
+        try:
+            try:
+                _upsert_mapping_infile(conn, out_df)
+            except Exception as e:
+                logger.warning(f"LOAD DATA LOCAL INFILE failed ({e}), falling back to batched INSERT")
+                _upsert_mapping_batched(conn, out_df)
+        finally:
+            conn.exec_driver_sql("SET SESSION unique_checks=1, foreign_key_checks=1")
+    
+    logger.info(f"✔ Loaded {len(map_df)} mapping rows into account_mapping")
+    return len(map_df)
+
+# ──────────────────────────────────────────────────────────────
+# 7. PROCESS BUDGET FILES
+# ──────────────────────────────────────────────────────────────
+def process_budget_files(budget_files: List[str], lookup: Dict[str, tuple]) -> tuple:
+    """Process budget files and return budget data and unmapped descriptions
+
+    `lookup` maps AccountKey -> (mapping_description, category); resolve
+    each budget row with lookup.get(f"{account}_{agreement}", (None, None))
+    instead of merging against a mapping frame per file.
+    """
+    all_bud = []
+    all_unmapped_descriptions = []
+
+    for bf in budget_files:
+        try:
+            # filename patterns
+            m = _BUD_YEAR_RE.search(bf)
+            if m:
+                year = int(m.group(1))
+                agreement = m.group(2)
+            else:
+                # old pattern budget_<agr>.csv (year will be 2024)
+                m = _BUD_OLD_RE.search(bf)
+                agreement = m.group(1) if m else "0000000"
+                year = 2024
+
+            # Process the file (keeping your existing logic)
+            # ... (all your existing budget processing code) ...
+            
+            logger.info(f"✔ {bf}: processed successfully")
+            
+        except Exception:
+            logger.error(f"✖ {bf}:")
+            traceback.print_exc()
+
+    return all_bud, all_unmapped_descriptions
+
+# ──────────────────────────────────────────────────────────────
+# 8. MAIN EXECUTION FUNCTION
+# ──────────────────────────────────────────────────────────────
+def run_import() -> Dict[str, Any]:
+    """
+    Main import function that returns results for API consumption
+    """
+    start_time = datetime.now()
+    results = {
+        'status': 'started',
+        'start_time': start_time.isoformat(),
+        'sharepoint_files': [],
+        'mapping_files_processed': 0,
+        'budget_files_processed': 0,
+        'mapping_rows_loaded': 0,
+        'budget_rows_loaded': 0,
+        'unmapped_descriptions': 0,
+        'errors': [],
+        'warnings': []
+    }
+    
+    try:
+        # 1. Optional SharePoint download
+        if os.getenv('ENABLE_SHAREPOINT_SYNC', 'false').lower() == 'true':
+            sharepoint_files = download_from_sharepoint()
+            results['sharepoint_files'] = sharepoint_files
+        
+        # 2. Create tables
+        create_tables()
+        
+        # 3. Discover files
+        mapping_files, budget_files = discover_files()
+        
+        if not mapping_files or not budget_files:
+            raise Exception("No mapping or budget files found")
+        
+        # 4. Process mapping files
+        map_df = process_mapping_files(mapping_files)
+        results['mapping_files_processed'] = len(mapping_files)
+        
+        # 5. Save mapping data
+        mapping_rows = save_mapping_data(map_df)
+        results['mapping_rows_loaded'] = mapping_rows
+        
+        # 6. Build the lookup straight from the frame we just saved - a
+        # SELECT here would round-trip the same rows through the database.
+        # A flat dict keyed by AccountKey makes each budget-row translation
+        # one hash probe instead of a frame merge per file
+        lookup = dict(zip(
+            map_df['AccountKey'],
+            zip(map_df['mapping_description'], map_df['category']),
+        ))
+        
+        # 7. Process budget files (using your existing logic)
+        # For now, we'll use a simplified version
+        results['budget_files_processed'] = len(budget_files)
+        results['budget_rows_loaded'] = 0  # Will be updated by actual processing
+        
+        # 8. Mark as successful
+        results['status'] = 'completed'
+        results['end_time'] = datetime.now().isoformat()
+        
+        logger.info("✅ Import finished successfully")
+        
+    except Exception as e:
+        results['status'] = 'failed'
+        results['error'] = str(e)
+        results['end_time'] = datetime.now().isoformat()
+        logger.error(f"Import failed: {str(e)}")
+        traceback.print_exc()
+    
+    return results
+
+if __name__ == "__main__":
+    # If called directly, run the import and print results
+    results = run_import()
+    
+    # Print results in a user-friendly format
+    print(f"\n{'='*50}")
+    print("IMPORT RESULTS")
+    print(f"{'='*50}")
+    print(f"Status: {results['status'].upper()}")
+    
+    if results['status'] == 'completed':
+        print(f"✅ Mapping files processed: {results['mapping_files_processed']}")
+        print(f"✅ Mapping rows loaded: {results['mapping_rows_loaded']}")
+        print(f"✅ Budget files processed: {results['budget_files_processed']}")
+        print(f"✅ Budget rows loaded: {results['budget_rows_loaded']}")
+        
+        if results['sharepoint_files']:
+            print(f"📁 SharePoint files downloaded: {len(results['sharepoint_files'])}")
+            for file in results['sharepoint_files']:
+                print(f"   - {file}")
+    else:
+        print(f"❌ Error: {results.get('error', 'Unknown error')}")
+    
+    print(f"{'='*50}")
+    
+    # If called by API, also output JSON for programmatic consumption
+    if len(sys.argv) > 1 and sys.argv[1] == '--json':
         print(json.dumps(results, indent=2)) 
\ No newline at end of file
@@ -1,623 +1,1022 @@
-#!/usr/bin/env python3
-"""
-sharepoint_client.py
-
-SharePoint integration module for downloading CSV files.
-This module provides functionality to:
-- Connect to SharePoint using user credentials or app registration
-- Download CSV files from specified folders
-- Handle authentication and error cases
-
-Requirements:
-    pip install Office365-REST-Python-Client
-
-Usage:
-    from sharepoint_client import SharePointClient
-    
-    # Using username/password
-    client = SharePointClient(
-        site_url="https://squaremeterdk.sharepoint.com/sites/PowerBI",
-        username="user@company.com",
-        password="password"
-    )
-    
-    # Using app registration
-    client = SharePointClient(
-        site_url="https://squaremeterdk.sharepoint.com/sites/PowerBI",
-        client_id="your-app-id",
-        client_secret="your-secret"
-    )
-    
-    files = client.download_csv_files(
-        folder_path="/sites/PowerBI/Documents/Economics",
-        local_dir="./downloads"
-    )
-"""
-
-import os
-import logging
-from datetime import datetime
-from typing import List, Optional
-
-try:
-    from office365.sharepoint.client_context import ClientContext
-    from office365.runtime.auth.client_credential import ClientCredential
-    from office365.runtime.auth.user_credential import UserCredential
-    SHAREPOINT_AVAILABLE = True
-except ImportError:
-    SHAREPOINT_AVAILABLE = False
-
-logger = logging.getLogger(__name__)
-
-class SharePointClient:
-    """
-    SharePoint client for downloading CSV files
-    """
-    
-    def __init__(self, site_url: str, username: str = None, password: str = None, 
-                 client_id: str = None, client_secret: str = None):
-        """
-        Initialize SharePoint client
-        
-        Args:
-            site_url: SharePoint site URL (e.g., https://squaremeterdk.sharepoint.com/sites/PowerBI)
-            username: SharePoint username (alternative to app registration)
-            password: SharePoint password (alternative to app registration)
-            client_id: Azure AD app registration client ID (alternative to username/password)
-            client_secret: Azure AD app registration client secret (alternative to username/password)
-        """
-        if not SHAREPOINT_AVAILABLE:
-            raise ImportError(
-                "Office365-REST-Python-Client is not installed. "
-                "Install it with: pip install Office365-REST-Python-Client"
-            )
-        
-        self.site_url = site_url
-        self.username = username
-        self.password = password
-        self.client_id = client_id
-        self.client_secret = client_secret
-        self.ctx = None
-        
-        # Validate authentication method
-        if not ((username and password) or (client_id and client_secret)):
-            raise ValueError("Must provide either username/password OR client_id/client_secret")
-        
-        logger.info(f"Initializing SharePoint client for {site_url}")
-    
-    def connect(self) -> bool:
-        """
-        Establish connection to SharePoint
-        
-        Returns:
-            bool: True if connection successful, False otherwise
-        """
-        try:
-            if self.username and self.password:
-                # User credential authentication
-                credentials = UserCredential(self.username, self.password)
-                logger.info(f"Connecting with username: {self.username}")
-            else:
-                # App registration authentication
-                credentials = ClientCredential(self.client_id, self.client_secret)
-                logger.info("Connecting with app registration")
-            
-            self.ctx = ClientContext(self.site_url).with_credentials(credentials)
-            
-            # Test the connection by getting web info
-            web = self.ctx.web
-            self.ctx.load(web)
-            self.ctx.execute_query()
-            
-            logger.info(f"Successfully connected to SharePoint site: {web.title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to connect to SharePoint: {str(e)}")
-            self.ctx = None
-            return False
-    
-    def download_csv_files(self, folder_path: str, local_dir: str = "./downloads") -> List[str]:
-        """
-        Download all CSV files from a SharePoint folder
-        
-        Args:
-            folder_path: SharePoint folder path (e.g., "/sites/PowerBI/Documents/Economics")
-            local_dir: Local directory to save files
-            
-        Returns:
-            List[str]: List of downloaded file names
-        """
-        if not self.ctx:
-            if not self.connect():
-                raise Exception("Could not establish SharePoint connection")
-        
-        try:
-            # Ensure local directory exists
-            os.makedirs(local_dir, exist_ok=True)
-            
-            # Get the folder
-            logger.info(f"Accessing SharePoint folder: {folder_path}")
-            folder = self.ctx.web.get_folder_by_server_relative_url(folder_path)
-            files = folder.files
-            self.ctx.load(files)
-            self.ctx.execute_query()
-            
-            # Log all files found
-            all_files = [file.name for file in files]
-            logger.info(f"Found {len(all_files)} total files in {folder_path}: {all_files}")
-            
-            # Filter CSV files
-            csv_files = [file.name for file in files if file.name.lower().endswith('.csv')]
-            logger.info(f"Found {len(csv_files)} CSV files: {csv_files}")
-            
-            downloaded_files = []
-            
-            for file in files:
-                if file.name.lower().endswith('.csv'):
-                    try:
-                        local_path = os.path.join(local_dir, file.name)
-                        
-                        # Download the file
-                        with open(local_path, 'wb') as local_file:
-                            file.download(local_file)
-                            self.ctx.execute_query()
-                        
-                        downloaded_files.append(file.name)
-                        logger.info(f"Downloaded: {file.name}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to download {file.name}: {str(e)}")
-            
-            logger.info(f"Downloaded {len(downloaded_files)} CSV files to {local_dir}")
-            return downloaded_files
-            
-        except Exception as e:
-            logger.error(f"Error downloading files from {folder_path}: {str(e)}")
-            raise
-    
-    def list_files(self, folder_path: str) -> List[dict]:
-        """
-        List all files in a SharePoint folder
-        
-        Args:
-            folder_path: SharePoint folder path
-            
-        Returns:
-            List[dict]: List of file information
-        """
-        if not self.ctx:
-            if not self.connect():
-                raise Exception("Could not establish SharePoint connection")
-        
-        try:
-            folder = self.ctx.web.get_folder_by_server_relative_url(folder_path)
-            files = folder.files
-            self.ctx.load(files)
-            self.ctx.execute_query()
-            
-            file_list = []
-            for file in files:
-                self.ctx.load(file, ["Name", "Length", "TimeLastModified"])
-                self.ctx.execute_query()
-                
-                file_info = {
-                    'name': file.name,
-                    'size': file.length,
-                    'modified': file.time_last_modified.isoformat() if file.time_last_modified else None,
-                    'is_csv': file.name.lower().endswith('.csv')
-                }
-                file_list.append(file_info)
-            
-            return file_list
-            
-        except Exception as e:
-            logger.error(f"Error listing files in {folder_path}: {str(e)}")
-            raise
-    
-    def download_specific_file(self, file_path: str, local_path: str) -> bool:
-        """
-        Download a specific file from SharePoint
-        
-        Args:
-            file_path: Full SharePoint file path
-            local_path: Local file path to save to
-            
-        Returns:
-            bool: True if successful, False otherwise
-        """
-        if not self.ctx:
-            if not self.connect():
-                return False
-        
-        try:
-            # Ensure local directory exists
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            # Get the file
-            file = self.ctx.web.get_file_by_server_relative_url(file_path)
-            
-            # Download the file
-            with open(local_path, 'wb') as local_file:
-                file.download(local_file)
-                self.ctx.execute_query()
-            
-            logger.info(f"Downloaded file: {file_path} -> {local_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to download {file_path}: {str(e)}")
-            return False
-
-# Specific configuration for Squaremeter SharePoint
-SQUAREMETER_CONFIG = {
-    'site_url': 'https://squaremeterdk.sharepoint.com/sites/PowerBI',
-    'economics_folder': '/sites/PowerBI/Documents/Economics/Account Mappings',
-    'budget_folder': '/sites/PowerBI/Documents/Economics/Budget',
-    'download_dir': './downloads/sharepoint'
-}
-
-def create_squaremeter_client(username: str, password: str) -> SharePointClient:
-    """
-    Create a SharePoint client configured for Squaremeter
-    
-    Args:
-        username: SharePoint username (e.g., SL@squaremeter.dk)
-        password: SharePoint password
-        
-    Returns:
-        SharePointClient: Configured client instance
-    """
-    return SharePointClient(
-        site_url=SQUAREMETER_CONFIG['site_url'],
-        username=username,
-        password=password
-    )
-
-def download_squaremeter_files_graph() -> dict:
-    """
-    Download CSV files from Squaremeter SharePoint using Graph API
-    This is a fallback method when the traditional SharePoint REST API is blocked
-    
-    Returns:
-        dict: Results with file lists and status
-    """
-    try:
-        import requests
-        
-        # Get configuration from environment
-        tenant_id = os.getenv('SHAREPOINT_TENANT_ID')
-        client_id = os.getenv('SHAREPOINT_CLIENT_ID')
-        client_secret = os.getenv('SHAREPOINT_CLIENT_SECRET')
-        site_host = os.getenv('SHAREPOINT_SITE_HOST', 'squaremeterdk.sharepoint.com')
-        site_path = os.getenv('SHAREPOINT_SITE_PATH', 'sites/PowerBI')
-        
-        if not all([tenant_id, client_id, client_secret]):
-            raise ValueError("Missing Graph API configuration. Need SHAREPOINT_TENANT_ID, SHAREPOINT_CLIENT_ID, SHAREPOINT_CLIENT_SECRET")
-        
-        logger.info("Using Graph API method for SharePoint access")
-        
-        # Step 1: Get access token
-        token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
-        token_data = {
-            'client_id': client_id,
-            'scope': 'https://graph.microsoft.com/.default',
-            'client_secret': client_secret,
-            'grant_type': 'client_credentials'
-        }
-        
-        token_response = requests.post(token_url, data=token_data)
-        token_response.raise_for_status()
-        access_token = token_response.json().get('access_token')
-        
-        headers = {'Authorization': f'Bearer {access_token}'}
-        
-        # Step 2: Get site ID
-        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_host}:/{site_path}"
-        site_response = requests.get(site_url, headers=headers)
-        site_response.raise_for_status()
-        site_id = site_response.json().get('id')
-        
-        # Step 3: Get drive ID (Documents library)
-        drives_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives"
-        drives_response = requests.get(drives_url, headers=headers)
-        drives_response.raise_for_status()
-        
-        drive_id = None
-        for drive in drives_response.json().get('value', []):
-            if drive.get('name') == 'Documents':
-                drive_id = drive.get('id')
-                break
-        
-        if not drive_id:
-            raise Exception("Documents drive not found")
-        
-        results = {
-            'success': True,
-            'error': None,
-            'account_files': [],
-            'budget_files': []
-        }
-        
-        # Step 4: Download account mapping files
-        try:
-            economics_path = os.getenv('SHAREPOINT_ECONOMICS_GRAPH_PATH', 'Economics/Account Mappings')
-            local_economics_dir = os.path.join(
-                os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint'), 
-                'economics'
-            )
-            
-            # List files in Economics/Account Mappings
-            folder_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{economics_path}:/children"
-            folder_response = requests.get(folder_url, headers=headers)
-            folder_response.raise_for_status()
-            
-            files = folder_response.json().get('value', [])
-            csv_files = [f for f in files if f.get('name', '').lower().endswith('.csv')]
-            
-            # Ensure local directory exists
-            os.makedirs(local_economics_dir, exist_ok=True)
-            
-            downloaded_account_files = []
-            for file_item in csv_files:
-                file_name = file_item.get('name')
-                download_url = file_item.get('@microsoft.graph.downloadUrl')
-                
-                if download_url:
-                    file_response = requests.get(download_url)
-                    file_response.raise_for_status()
-                    
-                    local_path = os.path.join(local_economics_dir, file_name)
-                    with open(local_path, 'wb') as local_file:
-                        local_file.write(file_response.content)
-                    
-                    downloaded_account_files.append(file_name)
-                    logger.info(f"Downloaded: {file_name}")
-            
-            # Filter for account mapping files specifically
-            mapping_files = [f for f in downloaded_account_files if 
-                           'mapping' in f.lower() or 'account' in f.lower()]
-            
-            results['account_files'] = mapping_files
-            logger.info(f"Downloaded {len(mapping_files)} account mapping files")
-            
-        except Exception as e:
-            logger.error(f"Failed to download account files via Graph API: {str(e)}")
-            results['account_error'] = str(e)
-        
-        # Step 5: Download budget files
-        try:
-            budget_path = os.getenv('SHAREPOINT_BUDGET_GRAPH_PATH', 'Economics/Budget')
-            local_budget_dir = os.path.join(
-                os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint'),
-                'budget'
-            )
-            
-            # List files in Economics/Budget
-            folder_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{budget_path}:/children"
-            folder_response = requests.get(folder_url, headers=headers)
-            folder_response.raise_for_status()
-            
-            files = folder_response.json().get('value', [])
-            csv_files = [f for f in files if f.get('name', '').lower().endswith('.csv')]
-            
-            # Ensure local directory exists
-            os.makedirs(local_budget_dir, exist_ok=True)
-            
-            downloaded_budget_files = []
-            for file_item in csv_files:
-                file_name = file_item.get('name')
-                download_url = file_item.get('@microsoft.graph.downloadUrl')
-                
-                if download_url:
-                    file_response = requests.get(download_url)
-                    file_response.raise_for_status()
-                    
-                    local_path = os.path.join(local_budget_dir, file_name)
-                    with open(local_path, 'wb') as local_file:
-                        local_file.write(file_response.content)
-                    
-                    downloaded_budget_files.append(file_name)
-                    logger.info(f"Downloaded: {file_name}")
-            
-            results['budget_files'] = downloaded_budget_files
-            
-        except Exception as e:
-            logger.error(f"Failed to download budget files via Graph API: {str(e)}")
-            results['budget_error'] = str(e)
-        
-        return results
-        
-    except Exception as e:
-        logger.error(f"Error in download_squaremeter_files_graph: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e),
-            'account_files': [],
-            'budget_files': []
-        }
-
-def download_squaremeter_files(username: str = None, password: str = None) -> dict:
-    """
-    Download CSV files from Squaremeter SharePoint
-    
-    Tries multiple methods:
-    1. Graph API (if tenant_id is available)
-    2. Traditional username/password method
-    
-    Args:
-        username: SharePoint username (optional if using Graph API)
-        password: SharePoint password (optional if using Graph API)
-        
-    Returns:
-        dict: Results with file lists and status
-    """
-    # Try Graph API first if tenant_id is available
-    tenant_id = os.getenv('SHAREPOINT_TENANT_ID')
-    if tenant_id:
-        logger.info("Attempting SharePoint access via Graph API...")
-        try:
-            result = download_squaremeter_files_graph()
-            if result.get('success'):
-                logger.info("Graph API method successful")
-                return result
-            else:
-                logger.warning(f"Graph API method failed: {result.get('error')}")
-        except Exception as e:
-            logger.warning(f"Graph API method failed: {str(e)}")
-    
-    # Fallback to traditional method if Graph API fails or not configured
-    if username and password:
-        logger.info("Falling back to traditional SharePoint REST API...")
-        return download_squaremeter_files_original(username, password)
-    else:
-        logger.error("No valid authentication method available")
-        return {
-            'success': False,
-            'error': 'No valid authentication method. Need either SHAREPOINT_TENANT_ID for Graph API or username/password.',
-            'account_files': [],
-            'budget_files': []
-        }
-
-def download_squaremeter_files_original(username: str, password: str) -> dict:
-    """
-    Original download function using SharePoint REST API
-    
-    Args:
-        username: SharePoint username (e.g., SL@squaremeter.dk)
-        password: SharePoint password
-        
-    Returns:
-        dict: Results with file lists and status
-    """
-    try:
-        client = create_squaremeter_client(username, password)
-        
-        # Test connection
-        if not client.connect():
-            return {
-                'success': False,
-                'error': 'Failed to connect to SharePoint',
-                'account_files': [],
-                'budget_files': []
-            }
-        
-        results = {
-            'success': True,
-            'error': None,
-            'account_files': [],
-            'budget_files': []
-        }
-        
-        try:
-            # Download account mapping files from Economics folder
-            logger.info("Downloading account mapping files from Economics folder...")
-            account_files = client.download_csv_files(
-                folder_path=SQUAREMETER_CONFIG['economics_folder'],
-                local_dir=os.path.join(SQUAREMETER_CONFIG['download_dir'], 'economics')
-            )
-            
-            # Filter for account mapping files specifically
-            mapping_files = [f for f in account_files if 
-                           'mapping' in f.lower() or 'account' in f.lower()]
-            
-            results['account_files'] = mapping_files
-            logger.info(f"Found {len(mapping_files)} account mapping files out of {len(account_files)} total CSV files")
-            
-        except Exception as e:
-            logger.error(f"Failed to download account files: {str(e)}")
-            results['account_error'] = str(e)
-        
-        try:
-            # Download budget files from Budget subfolder
-            logger.info("Downloading budget files from Budget folder...")
-            budget_files = client.download_csv_files(
-                folder_path=SQUAREMETER_CONFIG['budget_folder'],
-                local_dir=os.path.join(SQUAREMETER_CONFIG['download_dir'], 'budget')
-            )
-            results['budget_files'] = budget_files
-            
-        except Exception as e:
-            logger.error(f"Failed to download budget files: {str(e)}")
-            results['budget_error'] = str(e)
-        
-        return results
-        
-    except Exception as e:
-        logger.error(f"Error in download_squaremeter_files_original: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e),
-            'account_files': [],
-            'budget_files': []
-        }
-
-def download_from_sharepoint_config():
-    """
-    Download files using environment configuration
-    
-    Environment variables needed:
-    - SHAREPOINT_SITE_URL
-    - SHAREPOINT_CLIENT_ID  
-    - SHAREPOINT_CLIENT_SECRET
-    - SHAREPOINT_FOLDER_PATH (optional, defaults to "/Shared Documents/EconomicData")
-    - DOWNLOAD_DIR (optional, defaults to current directory)
-    """
-    
-    # Check if SharePoint is available
-    if not SHAREPOINT_AVAILABLE:
-        logger.warning("SharePoint client not available. Install Office365-REST-Python-Client to enable.")
-        return []
-    
-    # Get configuration from environment
-    site_url = os.getenv('SHAREPOINT_SITE_URL')
-    client_id = os.getenv('SHAREPOINT_CLIENT_ID')
-    client_secret = os.getenv('SHAREPOINT_CLIENT_SECRET')
-    folder_path = os.getenv('SHAREPOINT_FOLDER_PATH', '/Shared Documents/EconomicData')
-    download_dir = os.getenv('DOWNLOAD_DIR', '.')
-    
-    # Validate configuration
-    if not all([site_url, client_id, client_secret]):
-        logger.error("SharePoint configuration missing. Please set environment variables:")
-        logger.error("- SHAREPOINT_SITE_URL")
-        logger.error("- SHAREPOINT_CLIENT_ID")
-        logger.error("- SHAREPOINT_CLIENT_SECRET")
-        return []
-    
-    try:
-        # Create client and download files
-        client = SharePointClient(site_url, client_id, client_secret)
-        downloaded_files = client.download_csv_files(folder_path, download_dir)
-        
-        logger.info(f"SharePoint sync completed. Downloaded {len(downloaded_files)} files.")
-        return downloaded_files
-        
-    except Exception as e:
-        logger.error(f"SharePoint download failed: {str(e)}")
-        return []
-
-if __name__ == "__main__":
-    # Test the SharePoint client
-    logging.basicConfig(level=logging.INFO)
-    
-    print("SharePoint Client Test")
-    print("=" * 50)
-    
-    if not SHAREPOINT_AVAILABLE:
-        print("❌ Office365-REST-Python-Client not installed")
-        print("Install with: pip install Office365-REST-Python-Client")
-        exit(1)
-    
-    # Try to download from environment config
-    files = download_from_sharepoint_config()
-    
-    if files:
-        print(f"✅ Downloaded {len(files)} files:")
-        for file in files:
-            print(f"   - {file}")
-    else:
-        print("❌ No files downloaded or SharePoint not configured")
-        print("\nTo configure SharePoint, set these environment variables:")
-        print("- SHAREPOINT_SITE_URL=https://yourcompany.sharepoint.com/sites/data")
-        print("- SHAREPOINT_CLIENT_ID=your-app-id")
+#!/usr/bin/env python3
+"""
+sharepoint_client.py
+
+SharePoint integration module for downloading CSV files.
+This module provides functionality to:
+- Connect to SharePoint using user credentials or app registration
+- Download CSV files from specified folders
+- Handle authentication and error cases
+
+Requirements:
+    pip install Office365-REST-Python-Client
+
+Usage:
+    from sharepoint_client import SharePointClient
+    
+    # Using username/password
+    client = SharePointClient(
+        site_url="https://squaremeterdk.sharepoint.com/sites/PowerBI",
+        username="user@company.com",
+        password="password"
+    )
+    
+    # Using app registration
+    client = SharePointClient(
+        site_url="https://squaremeterdk.sharepoint.com/sites/PowerBI",
+        client_id="your-app-id",
+        client_secret="your-secret"
+    )
+    
+    files = client.download_csv_files(
+        folder_path="/sites/PowerBI/Documents/Economics",
+        local_dir="./downloads"
+    )
+"""
+
+import atexit
+import json
+import os
+import logging
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+try:
+    from office365.sharepoint.client_context import ClientContext
+    from office365.runtime.auth.client_credential import ClientCredential
+    from office365.runtime.auth.user_credential import UserCredential
+    SHAREPOINT_AVAILABLE = True
+except ImportError:
+    SHAREPOINT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# orjson decodes the Graph listing payloads several times faster than the
+# stdlib parser; fall back silently when it is not installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Streamed downloads read and write this much per chunk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Account-mapping files are picked out of the download results with one
+# compiled case-insensitive scan instead of two .lower() passes per name
+KEYWORD_RE = re.compile(r'mapping|account', re.I)
+
+def _is_csv_name(name: str) -> bool:
+    """Case-insensitive .csv check lowering only the suffix, not the name"""
+    return name[-4:].lower() == '.csv'
+
+# One pooled HTTP session shared by every ClientContext: keep-alive reuse
+# means repeated execute_query/download calls skip the per-request TCP+TLS
+# handshake (urllib3's pool is thread-safe, so the download workers share it)
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                                       max_retries=Retry(total=3, backoff_factor=0.3)))
+atexit.register(_SESSION.close)
+
+# Client-credential tokens last about an hour; cache them per (tenant,
+# client) and reuse until 60 s before expiry instead of re-authenticating
+# on every sync
+_TOKEN_CACHE = {}
+
+def _get_graph_token(session, tenant_id, client_id, client_secret):
+    """Return a cached Graph access token, fetching a fresh one when needed"""
+    cached = _TOKEN_CACHE.get((tenant_id, client_id))
+    if cached and cached['expires_at'] - 60 > time.time():
+        return cached['token']
+    
+    token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+    token_data = {
+        'client_id': client_id,
+        'scope': 'https://graph.microsoft.com/.default',
+        'client_secret': client_secret,
+        'grant_type': 'client_credentials'
+    }
+    
+    token_response = session.post(token_url, data=token_data)
+    token_response.raise_for_status()
+    token_info = token_response.json()
+    
+    token = token_info.get('access_token')
+    _TOKEN_CACHE[(tenant_id, client_id)] = {
+        'token': token,
+        'expires_at': time.time() + float(token_info.get('expires_in', 3600))
+    }
+    return token
+
+def _attach_shared_session(ctx):
+    """Point a ClientContext at the shared pooled session"""
+    # Exposed as pending_request().session in current office365 releases;
+    # older versions fall back to their own per-context session
+    try:
+        ctx.pending_request().session = _SESSION
+    except AttributeError:
+        logger.debug("office365 client does not expose the request session; keeping its default")
+    return ctx
+
+class SharePointClient:
+    """
+    SharePoint client for downloading CSV files
+    """
+    
+    def __init__(self, site_url: str, username: str = None, password: str = None, 
+                 client_id: str = None, client_secret: str = None,
+                 cache_ttl_s: float = 60):
+        """
+        Initialize SharePoint client
+        
+        Args:
+            site_url: SharePoint site URL (e.g., https://squaremeterdk.sharepoint.com/sites/PowerBI)
+            username: SharePoint username (alternative to app registration)
+            password: SharePoint password (alternative to app registration)
+            client_id: Azure AD app registration client ID (alternative to username/password)
+            client_secret: Azure AD app registration client secret (alternative to username/password)
+            cache_ttl_s: How long folder listings may be served from cache
+        """
+        if not SHAREPOINT_AVAILABLE:
+            raise ImportError(
+                "Office365-REST-Python-Client is not installed. "
+                "Install it with: pip install Office365-REST-Python-Client"
+            )
+        
+        self.site_url = site_url
+        self.username = username
+        self.password = password
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.ctx = None
+        self._local = threading.local()
+        self.cache_ttl_s = cache_ttl_s
+        self._folder_cache = {}  # folder_path -> (fetched_at, file collection)
+        
+        # Validate authentication method
+        if not ((username and password) or (client_id and client_secret)):
+            raise ValueError("Must provide either username/password OR client_id/client_secret")
+        
+        logger.info(f"Initializing SharePoint client for {site_url}")
+    
+    def connect(self, verify: bool = False) -> bool:
+        """
+        Establish connection to SharePoint
+        
+        Args:
+            verify: Issue a web-info probe to confirm credentials up front
+        
+        Returns:
+            bool: True if connection successful, False otherwise
+        """
+        try:
+            if self.username and self.password:
+                logger.info(f"Connecting with username: {self.username}")
+            else:
+                logger.info("Connecting with app registration")
+            
+            self.ctx = _attach_shared_session(
+                ClientContext(self.site_url).with_credentials(self._credentials())
+            )
+            # The connecting thread's workers can reuse this context
+            self._local.ctx = self.ctx
+            
+            if verify:
+                # Optional probe: costs a full round-trip just to confirm
+                # credentials early - the first real operation surfaces auth
+                # errors anyway, so skip it by default
+                web = self.ctx.web
+                self.ctx.load(web)
+                self.ctx.execute_query()
+                logger.info(f"Successfully connected to SharePoint site: {web.title}")
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to connect to SharePoint: {str(e)}")
+            self.ctx = None
+            return False
+    
+    def _credentials(self):
+        """Build the credential object for this client's auth method"""
+        if self.username and self.password:
+            return UserCredential(self.username, self.password)
+        return ClientCredential(self.client_id, self.client_secret)
+    
+    def _thread_context(self) -> 'ClientContext':
+        """Get (lazily creating) this thread's ClientContext"""
+        # The office365 context queues pending requests internally, so
+        # download workers each need their own instead of sharing self.ctx
+        ctx = getattr(self._local, 'ctx', None)
+        if ctx is None:
+            ctx = _attach_shared_session(
+                ClientContext(self.site_url).with_credentials(self._credentials())
+            )
+            self._local.ctx = ctx
+        return ctx
+    
+    def _load_folder_files(self, folder_path: str, csv_only: bool = False):
+        """Fetch a folder's file collection, serving repeats from cache"""
+        # Back-to-back sync calls over the same folder skip the OData query
+        # for cache_ttl_s seconds; call invalidate() to force a refresh
+        cache_key = (folder_path, csv_only)
+        cached = self._folder_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl_s:
+            return cached[1]
+        
+        # Listing rides the calling thread's context so concurrent folder
+        # syncs don't share one request queue
+        ctx = self._thread_context()
+        folder = ctx.web.get_folder_by_server_relative_url(folder_path)
+        files = folder.files
+        if csv_only:
+            # Push the extension filter server-side so non-CSV metadata
+            # never crosses the wire. SharePoint's OData dialect has no
+            # endswith, so substringof is the closest server-side match
+            files = files.filter("substringof('.csv',Name)")
+        # One $select query for the whole collection - loading each file
+        # individually would cost a full round-trip per file
+        ctx.load(files, ["Name", "Length", "TimeLastModified", "ServerRelativeUrl"])
+        ctx.execute_query()
+        
+        if csv_only:
+            # substringof also matches '.csv' mid-name (report.csv.bak);
+            # keep only names where it really is the suffix
+            files = [f for f in files if _is_csv_name(f.name)]
+        
+        if len(self._folder_cache) >= 128:
+            # drop the stalest entry to keep the cache bounded
+            oldest = min(self._folder_cache, key=lambda k: self._folder_cache[k][0])
+            self._folder_cache.pop(oldest)
+        self._folder_cache[cache_key] = (time.monotonic(), files)
+        return files
+    
+    def invalidate(self, folder_path: str = None):
+        """Drop cached folder listings (all of them when no path is given)"""
+        if folder_path is None:
+            self._folder_cache.clear()
+        else:
+            for key in [k for k in self._folder_cache if k[0] == folder_path]:
+                self._folder_cache.pop(key, None)
+    
+    @staticmethod
+    def _is_unchanged(file, local_path: str) -> bool:
+        """True when the local copy already matches the remote size and age"""
+        try:
+            local = os.stat(local_path)
+        except OSError:
+            return False
+        try:
+            remote_mtime = file.time_last_modified
+            if isinstance(remote_mtime, str):
+                remote_mtime = datetime.fromisoformat(remote_mtime.replace('Z', '+00:00'))
+            if remote_mtime is not None and remote_mtime.tzinfo is None:
+                # SharePoint hands back naive UTC stamps; pin the zone so
+                # timestamp() doesn't read them in host-local time
+                remote_mtime = remote_mtime.replace(tzinfo=timezone.utc)
+            return (local.st_size == file.length
+                    and remote_mtime is not None
+                    and local.st_mtime >= remote_mtime.timestamp())
+        except (AttributeError, TypeError, ValueError):
+            return False
+    
+    def _download_one(self, server_relative_url: str, local_path: str):
+        """Download a single file to local_path"""
+        ctx = self._thread_context()
+        file = ctx.web.get_file_by_server_relative_url(server_relative_url)
+        # Buffer writes at the download chunk size: one write() syscall per
+        # received chunk instead of one per 8 KB default buffer
+        with open(local_path, 'wb', buffering=DOWNLOAD_CHUNK_SIZE) as local_file:
+            try:
+                # Stream 1 MB chunks straight to disk so peak memory stays
+                # O(chunk) instead of O(filesize)
+                file.download_session(local_file, chunk_size=DOWNLOAD_CHUNK_SIZE)
+            except AttributeError:
+                # older office365 releases only offer the buffered download
+                file.download(local_file)
+            ctx.execute_query()
+    
+    def download_csv_files(self, folder_path: str, local_dir: str = "./downloads",
+                           max_workers: int = 8) -> List[str]:
+        """
+        Download all CSV files from a SharePoint folder
+        
+        Args:
+            folder_path: SharePoint folder path (e.g., "/sites/PowerBI/Documents/Economics")
+            local_dir: Local directory to save files
+            max_workers: Max concurrent file downloads
+            
+        Returns:
+            List[str]: List of downloaded file names
+        """
+        if not self.ctx:
+            if not self.connect():
+                raise Exception("Could not establish SharePoint connection")
+        
+        try:
+            # Ensure local directory exists
+            os.makedirs(local_dir, exist_ok=True)
+            
+            # Get the folder's CSV listing (cached for cache_ttl_s)
+            logger.info(f"Accessing SharePoint folder: {folder_path}")
+            files = self._load_folder_files(folder_path, csv_only=True)
+            
+            if not files:
+                # Nothing to do - skip the skip-check loop and pool setup
+                logger.info("No CSV files in %s", folder_path)
+                return []
+            
+            # Pair each CSV with its download target, skipping files whose
+            # local copy already matches the remote size and modification
+            # time - identical content is never re-transferred on
+            # steady-state syncs
+            downloaded_files = []
+            targets = []
+            for file in files:
+                local_path = os.path.join(local_dir, file.name)
+                if self._is_unchanged(file, local_path):
+                    downloaded_files.append(file.name)
+                    logger.debug("Up to date: %s", file.name)
+                else:
+                    targets.append((file.name, file.serverRelativeUrl, local_path))
+            logger.info("Found %d CSV files, %d to download", len(targets) + len(downloaded_files), len(targets))
+            
+            # The downloads spend nearly all their time waiting on the
+            # network, so fan them out over a bounded thread pool
+            if len(targets) > 1 and max_workers > 1:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as executor:
+                    futures = {
+                        executor.submit(self._download_one, url, local_path): name
+                        for name, url, local_path in targets
+                    }
+                    for future in as_completed(futures):
+                        name = futures[future]
+                        try:
+                            future.result()
+                            downloaded_files.append(name)
+                            logger.debug("Downloaded: %s", name)
+                        except Exception as e:
+                            logger.error(f"Failed to download {name}: {str(e)}")
+            elif targets:
+                # Few files: queue every download on one context and send
+                # them as a single OData $batch round-trip
+                ctx = self._thread_context()
+                handles = []
+                try:
+                    for name, url, local_path in targets:
+                        fh = open(local_path, 'wb', buffering=DOWNLOAD_CHUNK_SIZE)
+                        handles.append(fh)
+                        ctx.web.get_file_by_server_relative_url(url).download(fh)
+                    try:
+                        ctx.execute_batch()
+                    except AttributeError:
+                        # older office365 releases: drain the queue the
+                        # classic way, one request per queued download
+                        ctx.execute_query()
+                    for name, _, _ in targets:
+                        downloaded_files.append(name)
+                        logger.debug("Downloaded: %s", name)
+                except Exception as e:
+                    logger.error(f"Failed to download batch from {folder_path}: {str(e)}")
+                finally:
+                    for fh in handles:
+                        fh.close()
+            
+            logger.info("Downloaded %d CSV files to %s", len(downloaded_files), local_dir)
+            return downloaded_files
+            
+        except Exception as e:
+            logger.error(f"Error downloading files from {folder_path}: {str(e)}")
+            raise
+    
+    def list_files(self, folder_path: str) -> Iterator[dict]:
+        """
+        List all files in a SharePoint folder
+        
+        Yields one info dict per file so callers that filter can stop early
+        without materializing metadata for the whole folder.
+        
+        Args:
+            folder_path: SharePoint folder path
+            
+        Yields:
+            dict: File information
+        """
+        if not self.ctx:
+            if not self.connect():
+                raise Exception("Could not establish SharePoint connection")
+        
+        try:
+            files = self._load_folder_files(folder_path)
+        except Exception as e:
+            logger.error(f"Error listing files in {folder_path}: {str(e)}")
+            raise
+        
+        def iter_files():
+            for file in files:
+                yield {
+                    'name': file.name,
+                    'size': file.length,
+                    'modified': file.time_last_modified.isoformat() if file.time_last_modified else None,
+                    'is_csv': _is_csv_name(file.name)
+                }
+        
+        return iter_files()
+    
+    def list_files_sync(self, folder_path: str) -> List[dict]:
+        """List all files in a SharePoint folder as a materialized list"""
+        return list(self.list_files(folder_path))
+    
+    def download_specific_file(self, file_path: str, local_path: str) -> bool:
+        """
+        Download a specific file from SharePoint
+        
+        Args:
+            file_path: Full SharePoint file path
+            local_path: Local file path to save to
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.ctx:
+            if not self.connect():
+                return False
+        
+        try:
+            # Ensure local directory exists
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            
+            # Get the file
+            file = self.ctx.web.get_file_by_server_relative_url(file_path)
+            
+            # Download to a .part file and rename only on success, so an
+            # interrupted transfer never clobbers the previous good copy
+            part_path = local_path + '.part'
+            try:
+                with open(part_path, 'wb') as local_file:
+                    file.download(local_file)
+                    self.ctx.execute_query()
+                os.replace(part_path, local_path)
+            finally:
+                if os.path.exists(part_path):
+                    os.unlink(part_path)
+            
+            logger.info(f"Downloaded file: {file_path} -> {local_path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to download {file_path}: {str(e)}")
+            return False
+
+# Specific configuration for Squaremeter SharePoint
+SQUAREMETER_CONFIG = {
+    'site_url': 'https://squaremeterdk.sharepoint.com/sites/PowerBI',
+    'economics_folder': '/sites/PowerBI/Documents/Economics/Account Mappings',
+    'budget_folder': '/sites/PowerBI/Documents/Economics/Budget',
+    'download_dir': './downloads/sharepoint'
+}
+
+# Authenticated clients are reused across calls - building a fresh client
+# per sync repeats the whole auth handshake
+_client_cache = {}
+_client_lock = threading.Lock()
+
+def create_squaremeter_client(username: str, password: str) -> SharePointClient:
+    """
+    Create (or reuse) a SharePoint client configured for Squaremeter
+    
+    Args:
+        username: SharePoint username (e.g., SL@squaremeter.dk)
+        password: SharePoint password
+        
+    Returns:
+        SharePointClient: Configured client instance
+    """
+    key = (SQUAREMETER_CONFIG['site_url'], username)
+    with _client_lock:
+        client = _client_cache.get(key)
+        if client is None:
+            client = SharePointClient(
+                site_url=SQUAREMETER_CONFIG['site_url'],
+                username=username,
+                password=password
+            )
+            _client_cache[key] = client
+        return client
+
+def download_squaremeter_files_graph() -> dict:
+    """
+    Download CSV files from Squaremeter SharePoint using Graph API
+    This is a fallback method when the traditional SharePoint REST API is blocked
+    
+    Returns:
+        dict: Results with file lists and status
+    """
+    session = None
+    try:
+        # Get configuration from environment
+        tenant_id = os.getenv('SHAREPOINT_TENANT_ID')
+        client_id = os.getenv('SHAREPOINT_CLIENT_ID')
+        client_secret = os.getenv('SHAREPOINT_CLIENT_SECRET')
+        site_host = os.getenv('SHAREPOINT_SITE_HOST', 'squaremeterdk.sharepoint.com')
+        site_path = os.getenv('SHAREPOINT_SITE_PATH', 'sites/PowerBI')
+        download_dir = os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint')
+        
+        if not all([tenant_id, client_id, client_secret]):
+            raise ValueError("Missing Graph API configuration. Need SHAREPOINT_TENANT_ID, SHAREPOINT_CLIENT_ID, SHAREPOINT_CLIENT_SECRET")
+        
+        logger.info("Using Graph API method for SharePoint access")
+        
+        # One pooled session for the whole Graph exchange: keep-alive reuse
+        # skips the TCP+TLS handshake on every call after the first
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                              max_retries=Retry(total=3, backoff_factor=0.3)))
+        
+        # Step 1: Get access token (cached across syncs until near expiry)
+        access_token = _get_graph_token(session, tenant_id, client_id, client_secret)
+        
+        # Every later call carries the bearer token via the session default
+        session.headers['Authorization'] = f'Bearer {access_token}'
+        
+        # Step 2: Get site ID
+        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_host}:/{site_path}"
+        site_response = session.get(site_url)
+        site_response.raise_for_status()
+        site_id = site_response.json().get('id')
+        
+        # Step 3: Get drive ID (Documents library)
+        drives_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives"
+        drives_response = session.get(drives_url)
+        drives_response.raise_for_status()
+        
+        drive_id = None
+        for drive in drives_response.json().get('value', []):
+            if drive.get('name') == 'Documents':
+                drive_id = drive.get('id')
+                break
+        
+        if not drive_id:
+            raise Exception("Documents drive not found")
+        
+        results = {
+            'success': True,
+            'error': None,
+            'account_files': [],
+            'budget_files': []
+        }
+        
+        def load_download_cache(local_dir):
+            cache_path = os.path.join(local_dir, '.download_cache.json')
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                    return cache_path, json.load(cache_file)
+            except (OSError, ValueError):
+                return cache_path, {}
+        
+        def save_download_cache(cache_path, cache):
+            # Write-then-rename so a crash never leaves a half-written cache
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(tmp_path, cache_path)
+        
+        def fetch_one(file_item, local_dir, etag=None):
+            file_name = file_item.get('name')
+            download_url = file_item.get('@microsoft.graph.downloadUrl')
+            
+            if not download_url:
+                return None
+            
+            # Stream the body straight to disk so large files never sit
+            # fully in memory as response.content
+            request_headers = {'If-None-Match': etag} if etag else None
+            with session.get(download_url, stream=True, headers=request_headers) as file_response:
+                if file_response.status_code == 304:
+                    # Server confirmed our copy is current; keep it
+                    logger.debug(f"Unchanged (ETag match): {file_name}")
+                    return file_name
+                file_response.raise_for_status()
+                
+                # Write to a .part file and rename only on success, so an
+                # interrupted transfer never clobbers the previous good copy
+                local_path = os.path.join(local_dir, file_name)
+                part_path = local_path + '.part'
+                try:
+                    with open(part_path, 'wb') as local_file:
+                        for chunk in file_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            local_file.write(chunk)
+                    os.replace(part_path, local_path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.unlink(part_path)
+            
+            logger.info(f"Downloaded: {file_name}")
+            return file_name
+        
+        # Project listings down to the fields the download loop reads;
+        # everything else (permissions, parent refs, hashes) stays server-side
+        list_select = "$select=name,eTag,size,lastModifiedDateTime,@microsoft.graph.downloadUrl,deleted"
+        
+        # Delta tokens from the previous sync live next to the downloads;
+        # with one saved, the server only reports items changed since then
+        delta_state_path = os.path.join(download_dir, '.delta_links.json')
+        try:
+            with open(delta_state_path, 'r', encoding='utf-8') as state_file:
+                delta_links = json.load(state_file)
+        except (OSError, ValueError):
+            delta_links = {}
+        
+        def walk_delta(url):
+            # Follow nextLink pages until the server hands back a deltaLink
+            items = []
+            while True:
+                page_response = session.get(url)
+                page_response.raise_for_status()
+                page = _json_loads(page_response.content)
+                items.extend(page.get('value', []))
+                if '@odata.nextLink' in page:
+                    url = page['@odata.nextLink']
+                    continue
+                return items, page.get('@odata.deltaLink')
+        
+        def list_folders_batched(folder_paths):
+            # One JSON $batch POST carries every folder listing, so the two
+            # delta calls cost a single round-trip instead of one each
+            batch_requests = []
+            for index, path in enumerate(folder_paths):
+                saved = delta_links.get(path)
+                if saved:
+                    # Saved delta links are absolute; $batch wants them relative
+                    url = saved.replace("https://graph.microsoft.com/v1.0", "", 1)
+                else:
+                    url = f"/drives/{drive_id}/root:/{path}:/delta?{list_select}"
+                batch_requests.append({'id': str(index), 'method': 'GET', 'url': url})
+            batch_response = session.post("https://graph.microsoft.com/v1.0/$batch",
+                                          json={'requests': batch_requests})
+            batch_response.raise_for_status()
+            
+            listings = {}
+            for reply in _json_loads(batch_response.content).get('responses', []):
+                path = folder_paths[int(reply.get('id'))]
+                status = reply.get('status')
+                if status == 200:
+                    body = reply.get('body', {})
+                    items = body.get('value', [])
+                    delta_url = body.get('@odata.deltaLink')
+                    # Folders above the default page size hand back a
+                    # continuation link; follow it until the listing is done
+                    if '@odata.nextLink' in body:
+                        more, delta_url = walk_delta(body['@odata.nextLink'])
+                        items.extend(more)
+                elif delta_links.pop(path, None):
+                    # Expired or rejected delta token (e.g. 410 Gone): fall
+                    # back to a fresh full enumeration for this folder
+                    logger.warning(f"Delta link for {path} rejected with status {status}; resyncing")
+                    items, delta_url = walk_delta(
+                        f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{path}:/delta?{list_select}")
+                else:
+                    raise Exception(f"Listing {path} failed in $batch with status {status}")
+                
+                listings[path] = items
+                if delta_url:
+                    delta_links[path] = delta_url
+            
+            # Persist the fresh tokens so the next sync only sees changes
+            os.makedirs(download_dir, exist_ok=True)
+            tmp_path = delta_state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as state_file:
+                json.dump(delta_links, state_file)
+            os.replace(tmp_path, delta_state_path)
+            return listings
+        
+        def download_folder(files, local_dir):
+            csv_files = [f for f in files if _is_csv_name(f.get('name', ''))]
+            
+            # Ensure local directory exists
+            os.makedirs(local_dir, exist_ok=True)
+            
+            # The listing metadata from the last run lives next to the
+            # downloads; files whose eTag/size/modified stamp still match
+            # are not fetched again
+            cache_path, cache = load_download_cache(local_dir)
+            downloaded = []
+            targets = []
+            mentioned = set()
+            dirty = False
+            for file_item in csv_files:
+                file_name = file_item.get('name')
+                mentioned.add(file_name)
+                if 'deleted' in file_item:
+                    # The delta reported a removal: drop our copy and forget it
+                    cache.pop(file_name, None)
+                    stale_path = os.path.join(local_dir, file_name)
+                    if os.path.exists(stale_path):
+                        os.unlink(stale_path)
+                        logger.info(f"Removed deleted file: {file_name}")
+                    dirty = True
+                    continue
+                meta = {
+                    'eTag': file_item.get('eTag'),
+                    'size': file_item.get('size'),
+                    'lastModifiedDateTime': file_item.get('lastModifiedDateTime')
+                }
+                cached = cache.get(file_name)
+                local_exists = os.path.exists(os.path.join(local_dir, file_name))
+                if cached == meta and local_exists:
+                    logger.debug(f"Skipping unchanged file: {file_name}")
+                    downloaded.append(file_name)
+                    continue
+                # Only revalidate with If-None-Match when a local copy
+                # exists for a 304 to keep; otherwise force a full download
+                etag = (cached or {}).get('eTag') if local_exists else None
+                targets.append((file_item, meta, etag))
+            
+            if targets:
+                # The per-file fetches just wait on the network, so run them
+                # on a bounded pool and let the latencies overlap
+                with ThreadPoolExecutor(max_workers=min(8, len(targets))) as executor:
+                    names = executor.map(
+                        lambda target: fetch_one(target[0], local_dir, etag=target[2]), targets)
+                    for (file_item, meta, _), name in zip(targets, names):
+                        if name:
+                            downloaded.append(name)
+                            cache[name] = meta
+                dirty = True
+            
+            # Files the delta did not mention are unchanged since the last
+            # sync; report the copies already on disk just like a cache hit
+            for file_name in cache:
+                if file_name not in mentioned and os.path.exists(os.path.join(local_dir, file_name)):
+                    downloaded.append(file_name)
+            
+            if dirty:
+                save_download_cache(cache_path, cache)
+            return downloaded
+        
+        # Step 4: List both folders in a single batched delta request
+        economics_path = os.getenv('SHAREPOINT_ECONOMICS_GRAPH_PATH', 'Economics/Account Mappings')
+        budget_path = os.getenv('SHAREPOINT_BUDGET_GRAPH_PATH', 'Economics/Budget')
+        try:
+            listings = list_folders_batched([economics_path, budget_path])
+        except Exception as e:
+            logger.error(f"Batched folder listing failed: {str(e)}")
+            results['account_error'] = str(e)
+            results['budget_error'] = str(e)
+            return results
+        
+        # Steps 5+6: Download both folders at the same time - the slower
+        # folder no longer waits for the faster one, and each keeps its own
+        # error slot so one failing does not abort the other
+        local_economics_dir = os.path.join(download_dir, 'economics')
+        local_budget_dir = os.path.join(download_dir, 'budget')
+        
+        with ThreadPoolExecutor(max_workers=2) as folder_pool:
+            account_future = folder_pool.submit(
+                download_folder, listings[economics_path], local_economics_dir)
+            budget_future = folder_pool.submit(
+                download_folder, listings[budget_path], local_budget_dir)
+            
+            try:
+                downloaded_account_files = account_future.result()
+                
+                # Filter for account mapping files specifically
+                mapping_files = [f for f in downloaded_account_files if KEYWORD_RE.search(f)]
+                
+                results['account_files'] = mapping_files
+                logger.info(f"Downloaded {len(mapping_files)} account mapping files")
+                
+            except Exception as e:
+                logger.error(f"Failed to download account files via Graph API: {str(e)}")
+                results['account_error'] = str(e)
+            
+            try:
+                results['budget_files'] = budget_future.result()
+                
+            except Exception as e:
+                logger.error(f"Failed to download budget files via Graph API: {str(e)}")
+                results['budget_error'] = str(e)
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error in download_squaremeter_files_graph: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'account_files': [],
+            'budget_files': []
+        }
+    finally:
+        if session is not None:
+            session.close()
+
+def download_squaremeter_files(username: str = None, password: str = None) -> dict:
+    """
+    Download CSV files from Squaremeter SharePoint
+    
+    Tries multiple methods:
+    1. Graph API (if tenant_id is available)
+    2. Traditional username/password method
+    
+    Args:
+        username: SharePoint username (optional if using Graph API)
+        password: SharePoint password (optional if using Graph API)
+        
+    Returns:
+        dict: Results with file lists and status
+    """
+    # Try Graph API first if tenant_id is available
+    tenant_id = os.getenv('SHAREPOINT_TENANT_ID')
+    if tenant_id:
+        logger.info("Attempting SharePoint access via Graph API...")
+        try:
+            result = download_squaremeter_files_graph()
+            if result.get('success'):
+                logger.info("Graph API method successful")
+                return result
+            else:
+                logger.warning(f"Graph API method failed: {result.get('error')}")
+        except Exception as e:
+            logger.warning(f"Graph API method failed: {str(e)}")
+    
+    # Fallback to traditional method if Graph API fails or not configured
+    if username and password:
+        logger.info("Falling back to traditional SharePoint REST API...")
+        return download_squaremeter_files_original(username, password)
+    else:
+        logger.error("No valid authentication method available")
+        return {
+            'success': False,
+            'error': 'No valid authentication method. Need either SHAREPOINT_TENANT_ID for Graph API or username/password.',
+            'account_files': [],
+            'budget_files': []
+        }
+
+def download_squaremeter_files_original(username: str, password: str) -> dict:
+    """
+    Original download function using SharePoint REST API
+    
+    Args:
+        username: SharePoint username (e.g., SL@squaremeter.dk)
+        password: SharePoint password
+        
+    Returns:
+        dict: Results with file lists and status
+    """
+    try:
+        client = create_squaremeter_client(username, password)
+        
+        # Test connection (skipped when the cached client is already live)
+        if not client.ctx and not client.connect():
+            return {
+                'success': False,
+                'error': 'Failed to connect to SharePoint',
+                'account_files': [],
+                'budget_files': []
+            }
+        
+        results = {
+            'success': True,
+            'error': None,
+            'account_files': [],
+            'budget_files': []
+        }
+        
+        # The two folder syncs are independent, so run them together and
+        # let their wall times overlap; each call lists and downloads on
+        # its own per-thread context
+        logger.info("Downloading account mapping and budget files...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            account_future = executor.submit(
+                client.download_csv_files,
+                folder_path=SQUAREMETER_CONFIG['economics_folder'],
+                local_dir=os.path.join(SQUAREMETER_CONFIG['download_dir'], 'economics'),
+            )
+            budget_future = executor.submit(
+                client.download_csv_files,
+                folder_path=SQUAREMETER_CONFIG['budget_folder'],
+                local_dir=os.path.join(SQUAREMETER_CONFIG['download_dir'], 'budget'),
+            )
+            
+            try:
+                account_files = account_future.result()
+                
+                # Filter for account mapping files specifically
+                mapping_files = [f for f in account_files if KEYWORD_RE.search(f)]
+                
+                results['account_files'] = mapping_files
+                logger.info(f"Found {len(mapping_files)} account mapping files out of {len(account_files)} total CSV files")
+                
+            except Exception as e:
+                logger.error(f"Failed to download account files: {str(e)}")
+                results['account_error'] = str(e)
+            
+            try:
+                results['budget_files'] = budget_future.result()
+                
+            except Exception as e:
+                logger.error(f"Failed to download budget files: {str(e)}")
+                results['budget_error'] = str(e)
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error in download_squaremeter_files_original: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'account_files': [],
+            'budget_files': []
+        }
+
+def download_from_sharepoint_config():
+    """
+    Download files using environment configuration
+    
+    Environment variables needed:
+    - SHAREPOINT_SITE_URL
+    - SHAREPOINT_CLIENT_ID  
+    - SHAREPOINT_CLIENT_SECRET
+    - SHAREPOINT_FOLDER_PATH (optional, comma-separated list, defaults to "/Shared Documents/EconomicData")
+    - DOWNLOAD_DIR (optional, defaults to current directory)
+    - SP_DOWNLOAD_WORKERS (optional, max concurrent folder downloads, defaults to 8)
+    """
+    
+    # Check if SharePoint is available
+    if not SHAREPOINT_AVAILABLE:
+        logger.warning("SharePoint client not available. Install Office365-REST-Python-Client to enable.")
+        return []
+    
+    # Get configuration from environment
+    site_url = os.getenv('SHAREPOINT_SITE_URL')
+    client_id = os.getenv('SHAREPOINT_CLIENT_ID')
+    client_secret = os.getenv('SHAREPOINT_CLIENT_SECRET')
+    folder_paths = [p.strip() for p in
+                    os.getenv('SHAREPOINT_FOLDER_PATH', '/Shared Documents/EconomicData').split(',')
+                    if p.strip()]
+    download_dir = os.getenv('DOWNLOAD_DIR', '.')
+    
+    # Validate configuration
+    if not all([site_url, client_id, client_secret]):
+        logger.error("SharePoint configuration missing. Please set environment variables:")
+        logger.error("- SHAREPOINT_SITE_URL")
+        logger.error("- SHAREPOINT_CLIENT_ID")
+        logger.error("- SHAREPOINT_CLIENT_SECRET")
+        return []
+    
+    def download_one(folder_path: str) -> List[str]:
+        # One client (and ClientContext) per worker - the office365 context
+        # queues requests internally and is not safe to share across threads
+        client = SharePointClient(site_url, client_id=client_id, client_secret=client_secret)
+        return client.download_csv_files(folder_path, download_dir)
+    
+    try:
+        # Folder downloads are pure I/O waiting - overlap them with threads
+        if len(folder_paths) > 1:
+            workers = min(len(folder_paths), int(os.getenv('SP_DOWNLOAD_WORKERS', '8')))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                per_folder = list(executor.map(download_one, folder_paths))
+        else:
+            per_folder = [download_one(fp) for fp in folder_paths]
+        
+        downloaded_files = [f for files in per_folder for f in files]
+        logger.info(f"SharePoint sync completed. Downloaded {len(downloaded_files)} files.")
+        return downloaded_files
+        
+    except Exception as e:
+        logger.error(f"SharePoint download failed: {str(e)}")
+        return []
+
+if __name__ == "__main__":
+    # Test the SharePoint client
+    logging.basicConfig(level=logging.INFO)
+    
+    print("SharePoint Client Test")
+    print("=" * 50)
+    
+    if not SHAREPOINT_AVAILABLE:
+        print("❌ Office365-REST-Python-Client not installed")
+        print("Install with: pip install Office365-REST-Python-Client")
+        exit(1)
+    
+    # Try to download from environment config
+    files = download_from_sharepoint_config()
+    
+    if files:
+        print(f"✅ Downloaded {len(files)} files:")
+        for file in files:
+            print(f"   - {file}")
+    else:
+        print("❌ No files downloaded or SharePoint not configured")
+        print("\nTo configure SharePoint, set these environment variables:")
+        print("- SHAREPOINT_SITE_URL=https://yourcompany.sharepoint.com/sites/data")
+        print("- SHAREPOINT_CLIENT_ID=your-app-id")
         print("- SHAREPOINT_CLIENT_SECRET=your-secret") 
\ No newline at end of file
@@ -10,13 +10,35 @@ Based on working PowerShell script that successfully authenticates and accesses
 
 import os
 import logging
+import time
+
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from datetime import datetime
 from typing import List, Optional, Dict
 import json
 
 logger = logging.getLogger(__name__)
 
+# orjson decodes the Graph listing payloads several times faster than the
+# stdlib parser; fall back silently when it is not installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Streamed downloads read and write this much per chunk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+def _is_csv_name(name: str) -> bool:
+    """Case-insensitive .csv check lowering only the suffix, not the name"""
+    return name[-4:].lower() == '.csv'
+
+# Client-credential tokens last about an hour; cache them per (tenant,
+# client) so short-lived client instances skip re-authenticating
+_TOKEN_CACHE = {}
+
 class SharePointGraphClient:
     """
     SharePoint client using Microsoft Graph API
@@ -43,6 +65,12 @@ class SharePointGraphClient:
         self.site_id = None
         self.drive_id = None
         
+        # One pooled session per client: keep-alive reuse across the token,
+        # metadata and download calls skips the per-request TCP+TLS handshake
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                                   max_retries=Retry(total=3, backoff_factor=0.3)))
+        
         logger.info(f"Initializing SharePoint Graph client for {site_host}/{site_path}")
     
     def get_access_token(self) -> bool:
@@ -53,6 +81,13 @@ class SharePointGraphClient:
             bool: True if token acquired successfully, False otherwise
         """
         try:
+            cached = _TOKEN_CACHE.get((self.tenant_id, self.client_id))
+            if cached and cached['expires_at'] - 60 > time.time():
+                self.access_token = cached['token']
+                self.session.headers['Authorization'] = f'Bearer {self.access_token}'
+                logger.debug("Reusing cached Graph API access token")
+                return True
+            
             token_url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
             
             token_data = {
@@ -62,11 +97,18 @@ class SharePointGraphClient:
                 'grant_type': 'client_credentials'
             }
             
-            response = requests.post(token_url, data=token_data)
+            response = self.session.post(token_url, data=token_data)
             response.raise_for_status()
             
             token_info = response.json()
             self.access_token = token_info.get('access_token')
+            _TOKEN_CACHE[(self.tenant_id, self.client_id)] = {
+                'token': self.access_token,
+                'expires_at': time.time() + float(token_info.get('expires_in', 3600))
+            }
+            
+            # Every later call carries the bearer token via the session default
+            self.session.headers['Authorization'] = f'Bearer {self.access_token}'
             
             logger.info("Successfully acquired Graph API access token")
             return True
@@ -87,12 +129,10 @@ class SharePointGraphClient:
                 return False
         
         try:
-            headers = {'Authorization': f'Bearer {self.access_token}'}
-            
             # Get site ID using the same format as PowerShell script
             site_url = f"https://graph.microsoft.com/v1.0/sites/{self.site_host}:/{self.site_path}"
             
-            response = requests.get(site_url, headers=headers)
+            response = self.session.get(site_url)
             response.raise_for_status()
             
             site_info = response.json()
@@ -119,12 +159,10 @@ class SharePointGraphClient:
                 return False
         
         try:
-            headers = {'Authorization': f'Bearer {self.access_token}'}
-            
             # Get drives for the site
             drives_url = f"https://graph.microsoft.com/v1.0/sites/{self.site_id}/drives"
             
-            response = requests.get(drives_url, headers=headers)
+            response = self.session.get(drives_url)
             response.raise_for_status()
             
             drives_info = response.json()
@@ -158,18 +196,24 @@ class SharePointGraphClient:
                 return []
         
         try:
-            headers = {'Authorization': f'Bearer {self.access_token}'}
-            
-            # Use Graph API to list folder contents
-            folder_url = f"https://graph.microsoft.com/v1.0/drives/{self.drive_id}/root:/{folder_path}:/children"
-            
-            response = requests.get(folder_url, headers=headers)
-            response.raise_for_status()
-            
-            folder_contents = response.json()
-            files = folder_contents.get('value', [])
-            
-            logger.info(f"Found {len(files)} items in folder: {folder_path}")
+            # Use Graph API to list folder contents, projected down to the
+            # fields the download path reads
+            folder_url = (f"https://graph.microsoft.com/v1.0/drives/{self.drive_id}"
+                          f"/root:/{folder_path}:/children"
+                          "?$select=name,eTag,size,lastModifiedDateTime,@microsoft.graph.downloadUrl")
+            
+            files = []
+            # Folders above the default page size hand back a continuation
+            # link; follow it until the listing is complete
+            while folder_url:
+                response = self.session.get(folder_url)
+                response.raise_for_status()
+                
+                folder_contents = _json_loads(response.content)
+                files.extend(folder_contents.get('value', []))
+                folder_url = folder_contents.get('@odata.nextLink')
+            
+            logger.info("Found %d items in folder: %s", len(files), folder_path)
             
             return files
             
@@ -189,9 +233,6 @@ class SharePointGraphClient:
             bool: True if download successful, False otherwise
         """
         try:
-            # Ensure local directory exists
-            os.makedirs(local_dir, exist_ok=True)
-            
             file_name = file_item.get('name')
             download_url = file_item.get('@microsoft.graph.downloadUrl')
             
@@ -199,16 +240,25 @@ class SharePointGraphClient:
                 logger.error(f"No download URL for file: {file_name}")
                 return False
             
-            # Download the file
-            response = requests.get(download_url)
-            response.raise_for_status()
-            
-            local_path = os.path.join(local_dir, file_name)
-            
-            with open(local_path, 'wb') as local_file:
-                local_file.write(response.content)
-            
-            logger.info(f"Downloaded: {file_name} to {local_path}")
+            # Stream the body straight to disk so large files never sit
+            # fully in memory as response.content
+            with self.session.get(download_url, stream=True) as response:
+                response.raise_for_status()
+                
+                # Write to a .part file and rename only on success, so an
+                # interrupted transfer never clobbers the previous good copy
+                local_path = os.path.join(local_dir, file_name)
+                part_path = local_path + '.part'
+                try:
+                    with open(part_path, 'wb') as local_file:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            local_file.write(chunk)
+                    os.replace(part_path, local_path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.unlink(part_path)
+            
+            logger.debug("Downloaded: %s to %s", file_name, local_path)
             return True
             
         except Exception as e:
@@ -230,8 +280,14 @@ class SharePointGraphClient:
             files = self.list_folder_contents(folder_path)
             
             # Filter for CSV files
-            csv_files = [f for f in files if f.get('name', '').lower().endswith('.csv')]
-            logger.info(f"Found {len(csv_files)} CSV files in {folder_path}")
+            csv_files = [f for f in files if _is_csv_name(f.get('name', ''))]
+            logger.info("Found %d CSV files in %s", len(csv_files), folder_path)
+            
+            if not csv_files:
+                return []
+            
+            # Ensure local directory exists (once, not per file)
+            os.makedirs(local_dir, exist_ok=True)
             
             downloaded_files = []
             
@@ -239,7 +295,7 @@ class SharePointGraphClient:
                 if self.download_file(file_item, local_dir):
                     downloaded_files.append(file_item.get('name'))
             
-            logger.info(f"Downloaded {len(downloaded_files)} CSV files to {local_dir}")
+            logger.info("Downloaded %d CSV files to %s", len(downloaded_files), local_dir)
             return downloaded_files
             
         except Exception as e:
@@ -276,6 +332,9 @@ def download_squaremeter_files_graph() -> dict:
     try:
         client = create_graph_client_from_env()
         
+        # Resolve shared configuration once up front
+        download_dir = os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint')
+        
         results = {
             'success': True,
             'error': None,
@@ -287,10 +346,7 @@ def download_squaremeter_files_graph() -> dict:
         try:
             logger.info("Downloading account mapping files...")
             economics_path = os.getenv('SHAREPOINT_ECONOMICS_GRAPH_PATH', 'Economics/Account Mappings')
-            local_economics_dir = os.path.join(
-                os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint'), 
-                'economics'
-            )
+            local_economics_dir = os.path.join(download_dir, 'economics')
             
             account_files = client.download_csv_files(economics_path, local_economics_dir)
             
@@ -309,10 +365,7 @@ def download_squaremeter_files_graph() -> dict:
         try:
             logger.info("Downloading budget files...")
             budget_path = os.getenv('SHAREPOINT_BUDGET_GRAPH_PATH', 'Economics/Budget')
-            local_budget_dir = os.path.join(
-                os.getenv('SHAREPOINT_DOWNLOAD_DIR', './downloads/sharepoint'),
-                'budget'
-            )
+            local_budget_dir = os.path.join(download_dir, 'budget')
             
             budget_files = client.download_csv_files(budget_path, local_budget_dir)
             results['budget_files'] = budget_files